@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self) -> None:
+        from api import signals  # noqa: F401
+        from api.metrics import install_execute_wrapper
+        from foodgram.db import check_connections_health
+
+        request_started.connect(check_connections_health)
+        if settings.REQUEST_METRICS_ENABLED:
+            connection_created.connect(install_execute_wrapper)
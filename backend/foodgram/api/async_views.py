@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from django.urls import URLPattern
+
+from foodgram.db import check_connections_health
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Возвращает общий пул потоков для синхронных вьюх."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_API_VIEWS_THREADS,
+            thread_name_prefix='api-view',
+        )
+    return _executor
+
+
+def _call_view(view: Callable, request: HttpRequest,
+               *args, **kwargs) -> HttpResponse:
+    """
+    Выполняет вьюху в потоке пула и сразу рендерит ответ.
+    Соединения с БД в потоках пула не обслуживаются сигналами
+    request_started/request_finished, поэтому их состояние
+    проверяется здесь.
+    """
+    close_old_connections()
+    check_connections_health()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def run_in_threadpool(view: Callable) -> Callable:
+    """
+    Превращает синхронную вьюху в асинхронную.
+    Вьюха выполняется в отдельном пуле потоков, а не в единственном
+    потоке thread_sensitive, через который Django 3.2 пропускает
+    все синхронные вьюхи при работе по ASGI.
+    """
+    @functools.wraps(view)
+    async def async_view(request: HttpRequest,
+                         *args, **kwargs) -> HttpResponse:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(context.run, _call_view,
+                              view, request, *args, **kwargs)
+        )
+
+    return async_view
+
+
+def make_async_urlpatterns(urlpatterns: Iterable,
+                           names: Iterable[str]) -> list:
+    """Заменяет вьюхи маршрутов с указанными именами на асинхронные."""
+    names = set(names)
+    return [
+        URLPattern(url.pattern, run_in_threadpool(url.callback),
+                   url.default_args, url.name)
+        if isinstance(url, URLPattern) and url.name in names else url
+        for url in urlpatterns
+    ]
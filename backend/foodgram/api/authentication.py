@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key: str) -> str:
+    return f'auth_token:{key}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшированием пары (пользователь, токен).
+    Снимает запрос Token ⨝ User с каждого авторизованного запроса.
+    Записи удаляются при выходе, смене пароля и деактивации
+    пользователя (api.signals), а в остальных случаях живут
+    не дольше AUTH_TOKEN_CACHE_TIMEOUT секунд.
+    """
+
+    def authenticate_credentials(self, key: str) -> tuple:
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials,
+                      settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return credentials
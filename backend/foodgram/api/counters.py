@@ -0,0 +1,113 @@
+"""
+Счётчик просмотров рецептов с отложенной записью.
+
+Просмотры копятся в памяти процесса, фоновый поток раз
+в RECIPE_VIEWS_FLUSH_SECONDS записывает накопленные приросты одним
+UPDATE на пачку рецептов. Строка популярного рецепта блокируется
+раз за период на процесс, а не на каждый просмотр. Приросты,
+не записанные к падению процесса, теряются; при штатной остановке
+воркера они записываются при выходе.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+def add_views(deltas: dict) -> None:
+    """Прибавляет просмотры к рецептам: {id рецепта: прирост}."""
+    items = sorted(deltas.items())
+    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+        batch = items[start:start + FLUSH_BATCH_SIZE]
+        if connection.vendor == 'postgresql':
+            _add_views_postgresql(batch)
+        else:
+            Recipe.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                views=F('views') + Case(
+                    *(When(pk=pk, then=Value(delta)) for pk, delta in batch),
+                    output_field=IntegerField(),
+                )
+            )
+
+
+def _add_views_postgresql(batch: list) -> None:
+    """UPDATE ... FROM (VALUES ...) - один проход по пачке рецептов."""
+    table = connection.ops.quote_name(Recipe._meta.db_table)
+    values = ', '.join(['(%s, %s)'] * len(batch))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET views = {table}.views + v.delta '
+            f'FROM (VALUES {values}) AS v(id, delta) '
+            f'WHERE {table}.id = v.id',
+            [value for pair in batch for value in pair],
+        )
+
+
+class ViewCounter:
+    """
+    Буфер просмотров процесса.
+    Поток записи запускается при первом просмотре в процессе,
+    после fork воркера gunicorn буфер начинается заново.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._pid = None
+
+    def add(self, recipe_id: int) -> None:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._pending[recipe_id] += 1
+
+    def pending(self, recipe_id: int) -> int:
+        """Ещё не записанные просмотры рецепта в этом процессе."""
+        return self._pending.get(recipe_id, 0)
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные просмотры, возвращает число рецептов.
+        При ошибке базы приросты возвращаются в буфер до следующей
+        попытки.
+        """
+        with self._lock:
+            deltas, self._pending = self._pending, Counter()
+        if not deltas:
+            return 0
+        try:
+            add_views(deltas)
+        except DatabaseError:
+            logger.exception('Failed to flush views of %d recipes',
+                             len(deltas))
+            with self._lock:
+                self._pending.update(deltas)
+            return 0
+        return len(deltas)
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._pending = Counter()
+        threading.Thread(target=self._run, name='recipe-views',
+                         daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self) -> None:
+        stop = threading.Event()
+        while not stop.wait(settings.RECIPE_VIEWS_FLUSH_SECONDS):
+            close_old_connections()
+            self.flush()
+
+
+recipe_views = ViewCounter()
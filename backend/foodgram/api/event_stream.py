@@ -0,0 +1,176 @@
+"""
+Поток событий /api/events/ (Server-Sent Events) при работе по ASGI.
+
+Поток держит открытое соединение часами, а синхронная вьюха Django
+занимала бы на это время поток, поэтому он обслуживается отдельным
+ASGI приложением перед Django и ждёт события в цикле событий uvicorn.
+К базе он обращается только при подключении: проверяет токен
+и читает подписки и избранное пользователя.
+"""
+import asyncio
+import json
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.async_views import get_executor
+from api.authentication import CachedTokenAuthentication
+from api.events import Subscription, get_broker
+from recipes.models import Favorites
+from users.models import Subscriptions
+
+User = get_user_model()
+
+
+async def run_sync(func: Callable, *args):
+    """Выполняет функцию с запросами к базе в пуле потоков API."""
+    def call():
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), call
+    )
+
+
+def authenticate(header: bytes) -> User | None:
+    """Пользователь по заголовку Authorization: Token <ключ>."""
+    keyword, _, key = header.decode('latin-1').partition(' ')
+    if keyword != CachedTokenAuthentication.keyword or not key:
+        return None
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+def get_user_channels(user: User) -> list:
+    """Каналы пользователя: авторы из подписок и рецепты из избранного."""
+    authors = Subscriptions.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    recipes = Favorites.objects.filter(user=user).values_list(
+        'recipe_id', flat=True
+    )
+    return ([f'author:{pk}' for pk in authors]
+            + [f'recipe:{pk}' for pk in recipes])
+
+
+def format_event(event: dict) -> bytes:
+    return (f'event: {event["type"]}\n'
+            f'data: {json.dumps(event, ensure_ascii=False)}\n\n'
+            ).encode()
+
+
+class EventStreamApp:
+    """
+    ASGI приложение: GET /api/events/ отдаёт поток событий
+    пользователю с токеном, остальные запросы передаются Django.
+    Набор каналов фиксируется при подключении, поток закрывается
+    через EVENTS_STREAM_MAX_SECONDS: клиент переподключается
+    и получает новые подписки.
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable,
+                       send: Callable) -> None:
+        if scope['type'] != 'http' or scope['path'] != settings.EVENTS_PATH:
+            return await self.app(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405,
+                                      {'detail': 'Метод не разрешён.'},
+                                      [(b'allow', b'GET')])
+        headers = dict(scope['headers'])
+        user = await run_sync(authenticate, headers.get(b'authorization',
+                                                        b''))
+        if user is None:
+            return await self.respond(
+                send, 401,
+                {'detail': 'Учетные данные не были предоставлены.'},
+                [(b'www-authenticate', b'Token')],
+            )
+        channels = await run_sync(get_user_channels, user)
+        broker = get_broker()
+        subscription = broker.subscribe(channels)
+        try:
+            await self.stream(subscription, receive, send)
+        finally:
+            broker.unsubscribe(subscription)
+
+    @staticmethod
+    async def respond(send: Callable, status: int, data: dict,
+                      headers: list) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': json.dumps(data, ensure_ascii=False).encode(),
+        })
+
+    @staticmethod
+    async def stream(subscription: Subscription, receive: Callable,
+                     send: Callable) -> None:
+        """
+        Отправляет события по мере поступления и комментарий
+        раз в EVENTS_KEEPALIVE_SECONDS, чтобы прокси не закрывали
+        простаивающее соединение.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.EVENTS_STREAM_MAX_SECONDS
+
+        async def wait_disconnect() -> None:
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        disconnected = asyncio.ensure_future(wait_disconnect())
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                # Ответ не буферизуется nginx.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {settings.EVENTS_RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+        try:
+            while True:
+                timeout = min(settings.EVENTS_KEEPALIVE_SECONDS,
+                              deadline - loop.time())
+                if timeout <= 0:
+                    break
+                event = asyncio.ensure_future(subscription.get())
+                await asyncio.wait((event, disconnected), timeout=timeout,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    event.cancel()
+                    return
+                if not event.done():
+                    event.cancel()
+                    body = b': ping\n\n'
+                elif event.result() is None:
+                    break
+                else:
+                    body = format_event(event.result())
+                await send({'type': 'http.response.body', 'body': body,
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
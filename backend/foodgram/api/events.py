@@ -0,0 +1,193 @@
+"""
+События для клиентов: новые рецепты авторов из подписок и изменения
+рецептов из избранного.
+
+Сигналы публикуют событие в канал брокера после фиксации транзакции,
+api.event_stream раздаёт их открытым потокам /api/events/.
+Каналы: author:<id> - новые рецепты автора, recipe:<id> - изменение
+и удаление рецепта.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """
+    Очередь событий одного потока.
+    События кладутся из любого потока через цикл событий подписчика.
+    Если клиент не успевает забирать события, очередь закрывается:
+    поток завершается, клиент переподключается и догоняет
+    изменения через /api/recipes/changes/.
+    """
+
+    def __init__(self, channels: Iterable[str],
+                 loop: asyncio.AbstractEventLoop, max_size: int) -> None:
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.max_size = max_size
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    def put(self, event: dict) -> None:
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict) -> None:
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.max_size:
+            self.closed = True
+            event = None
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict | None:
+        """Следующее событие или None, если очередь переполнилась."""
+        return await self.queue.get()
+
+
+class MemoryBroker:
+    """
+    Брокер в памяти процесса.
+    Доходит только до потоков того же процесса: подходит для одного
+    воркера uvicorn, для нескольких процессов и серверов нужен
+    PostgresBroker.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels, asyncio.get_running_loop(),
+                                    settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Брокер на LISTEN/NOTIFY PostgreSQL для нескольких процессов
+    и серверов.
+    publish отправляет NOTIFY, а каждый процесс с открытыми потоками
+    держит одно соединение с LISTEN и раздаёт события своим
+    подписчикам. LISTEN не работает через pgbouncer в режиме
+    transaction pooling, поэтому адрес базы для него можно задать
+    отдельно: EVENTS_PG_HOST и EVENTS_PG_PORT.
+    """
+    pg_channel = 'foodgram_events'
+    reconnect_delay = 5
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._listener = None
+
+    def publish(self, channel: str, event: dict) -> None:
+        payload = json.dumps({'channel': channel, 'event': event})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [self.pg_channel, payload])
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='events-listener', daemon=True
+                )
+                self._listener.start()
+        return super().subscribe(channels)
+
+    def _connection_params(self) -> dict:
+        params = connection.get_connection_params()
+        if settings.EVENTS_PG_HOST:
+            params['host'] = settings.EVENTS_PG_HOST
+        if settings.EVENTS_PG_PORT:
+            params['port'] = settings.EVENTS_PG_PORT
+        return params
+
+    def _listen(self) -> None:
+        """
+        Получает уведомления и раздаёт их подписчикам процесса.
+        События за время переподключения теряются, клиенты
+        догоняют их через /api/recipes/changes/.
+        """
+        import psycopg2
+
+        while True:
+            pg_connection = None
+            try:
+                pg_connection = psycopg2.connect(**self._connection_params())
+                pg_connection.autocommit = True
+                with pg_connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                while True:
+                    if not select.select([pg_connection], [], [], 60)[0]:
+                        continue
+                    pg_connection.poll()
+                    while pg_connection.notifies:
+                        message = json.loads(
+                            pg_connection.notifies.pop(0).payload
+                        )
+                        MemoryBroker.publish(self, message['channel'],
+                                             message['event'])
+            except (psycopg2.Error, OSError):
+                logger.exception('Events listener connection failed')
+            finally:
+                if pg_connection is not None:
+                    pg_connection.close()
+            time.sleep(self.reconnect_delay)
+
+
+def get_broker() -> MemoryBroker:
+    """Брокер из настройки EVENTS_BROKER, один на процесс."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
+
+
+def publish_on_commit(channel: str, event: dict) -> None:
+    """
+    Публикует событие после фиксации транзакции.
+    Ошибка брокера не ломает запрос, данные которого уже сохранены.
+    """
+    def publish() -> None:
+        try:
+            get_broker().publish(channel, event)
+        except Exception:
+            logger.exception('Failed to publish %s to %s',
+                             event.get('type'), channel)
+
+    transaction.on_commit(publish)
@@ -1,16 +1,26 @@
 import base64
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
 
 class Base64ImageField(serializers.ImageField):
-    """Преобразует строку в изображение."""
+    """
+    Преобразует строку в изображение.
+    Файлы из multipart/form-data передаются в ImageField как есть.
+    """
 
     def to_internal_value(self, data: str) -> ContentFile:
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
+            # Размер проверяется до декодирования, по длине строки.
+            if len(imgstr) * 3 // 4 > settings.UPLOAD_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(
+                    f'Картинка больше '
+                    f'{settings.UPLOAD_IMAGE_MAX_SIZE // 2 ** 20} МБ.'
+                )
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
 
         return super().to_internal_value(data)
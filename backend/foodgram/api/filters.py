@@ -1,9 +1,9 @@
 from typing import Any
 
-from django.db.models import Q, QuerySet
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
 from django.db.models.functions import Lower
 from django_filters.rest_framework import FilterSet
-from django_filters.rest_framework.filters import (CharFilter,
+from django_filters.rest_framework.filters import (CharFilter, ChoiceFilter,
                                                    ModelMultipleChoiceFilter,
                                                    NumberFilter)
 from rest_framework import filters
@@ -29,14 +29,13 @@ class IngredientSearchFilter(filters.SearchFilter):
         search_terms = ''.join(self.get_search_terms(request))
         filtered_queryset = queryset.filter(
             Q(name__istartswith=search_terms) | Q(name__icontains=search_terms)
-        ).extra(
-            select={
-                "startswith_match":
-                    "CASE WHEN name ILIKE %s || '%%' THEN 0 ELSE 1 END"
-            },
-            select_params=[search_terms],
-            order_by=["startswith_match", Lower("name")]
-        )
+        ).annotate(
+            startswith_match=Case(
+                When(name__istartswith=search_terms, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('startswith_match', Lower('name'))
 
         return filtered_queryset
 
@@ -44,6 +43,8 @@ class IngredientSearchFilter(filters.SearchFilter):
 class RecipeFilters(FilterSet):
     """
     Фильтрация по тегам, автору, избранному и списку покупок.
+    ?ordering=trending - только популярные сейчас рецепты
+    (recipes.trending) от самого популярного.
     """
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
@@ -53,10 +54,15 @@ class RecipeFilters(FilterSet):
     author = CharFilter()
     is_favorited = NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = NumberFilter(method='filter_is_in_shopping_cart')
+    ordering = ChoiceFilter(
+        choices=(('-pub_date', 'Новые'), ('trending', 'Популярные')),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ordering')
 
     def filter_is_favorited(
             self,
@@ -77,3 +83,17 @@ class RecipeFilters(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_ordering(
+            self,
+            queryset: QuerySet,
+            name: str,
+            value: Any
+    ) -> QuerySet:
+        if value == 'trending':
+            # Читается индекс trending_recipe_score_idx, рецепты
+            # подтягиваются по первичному ключу.
+            return queryset.filter(trending__isnull=False).order_by(
+                '-trending__score', 'trending__recipe_id'
+            )
+        return queryset
@@ -0,0 +1,115 @@
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Histogram,
+                               generate_latest, multiprocess)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса."""
+
+    def __init__(self) -> None:
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def total_time(self) -> float:
+        return perf_counter() - self.started
+
+
+def start_request() -> tuple:
+    """Начинает учёт метрик запроса в текущем контексте."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+def get_current() -> RequestMetrics | None:
+    return _current.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """
+    Обёртка выполнения SQL, считающая запросы и время БД.
+    Устанавливается на каждое соединение, поэтому учитывает
+    и запросы из пула потоков ASGI режима.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - started
+
+
+def install_execute_wrapper(connection, **kwargs) -> None:
+    """Обработчик сигнала connection_created."""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class Registry:
+    """
+    Гистограммы запросов по имени вьюхи в prometheus_client.
+    Под gunicorn у каждого воркера свои значения, поэтому
+    gunicorn.conf.py включает multiprocess режим
+    (PROMETHEUS_MULTIPROC_DIR): воркеры пишут значения в файлы
+    каталога, /metrics на любом воркере отдаёт их сумму
+    по всем воркерам, живым и завершённым.
+    """
+
+    def __init__(self) -> None:
+        self.total = Histogram('foodgram_request_duration_seconds',
+                               'Request duration.', ['view'],
+                               buckets=DURATION_BUCKETS)
+        self.db = Histogram('foodgram_request_db_seconds',
+                            'Time spent in SQL queries.', ['view'],
+                            buckets=DURATION_BUCKETS)
+        self.serializer = Histogram('foodgram_request_serializer_seconds',
+                                    'Time spent in serializers.', ['view'],
+                                    buckets=DURATION_BUCKETS)
+        self.queries = Histogram('foodgram_request_queries',
+                                 'SQL queries per request.', ['view'],
+                                 buckets=QUERY_BUCKETS)
+
+    def observe(self, view: str, metrics: RequestMetrics,
+                total_time: float) -> None:
+        self.total.labels(view).observe(total_time)
+        self.db.labels(view).observe(metrics.db_time)
+        self.serializer.labels(view).observe(metrics.serializer_time)
+        self.queries.labels(view).observe(metrics.queries)
+
+    @staticmethod
+    def render() -> bytes:
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            collected = CollectorRegistry()
+            multiprocess.MultiProcessCollector(collected)
+        else:
+            collected = REGISTRY
+        return generate_latest(collected)
+
+
+registry = Registry()
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Отдаёт метрики в текстовом формате Prometheus."""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from rest_framework.permissions import SAFE_METHODS
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PIN_COOKIE = 'db_primary_pin'
+
+
+def is_api_request(request: HttpRequest) -> bool:
+    return request.path_info.startswith(settings.API_URL_PREFIX)
+
+
+class SkipForAPIMixin:
+    """
+    Не выполняет middleware для запросов к API.
+    API работает только с токенами, сессии, сообщения и CSRF
+    нужны лишь админке и остаются для всех остальных путей.
+    """
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddlewareForAdmin(SkipForAPIMixin, SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddlewareForAdmin(SkipForAPIMixin, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args,
+                     callback_kwargs):
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args,
+                                    callback_kwargs)
+
+
+class AuthenticationMiddlewareForAdmin(SkipForAPIMixin,
+                                       AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddlewareForAdmin(SkipForAPIMixin, MessageMiddleware):
+    pass
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Основа middleware для WSGI и ASGI.
+    Под ASGI Django 3.2 выполняет sync-only middleware и всю цепочку
+    после него через один общий поток, и запросы идут по одному.
+    Здесь get_response вызывается так, как его передал Django:
+    напрямую или через await. Наследники определяют
+    process_request, process_response и finish - синхронные,
+    без ввода-вывода, finish вызывается и при исключении.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт асинхронный экземпляр middleware,
+            # как у django.utils.deprecation.MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.process_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request, state)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        state = self.process_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, state)
+        return self.process_response(request, response, state)
+
+    def process_request(self, request: HttpRequest):
+        return None
+
+    def finish(self, request: HttpRequest, state) -> None:
+        pass
+
+    def process_response(self, request: HttpRequest, response: HttpResponse,
+                         state) -> HttpResponse:
+        return response
+
+
+class ReplicaPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    Закрепляет клиента за primary базой после изменения данных.
+    После успешного небезопасного запроса ставится кука на
+    DB_REPLICA_PIN_SECONDS, пока она жива, чтения не уходят на реплики
+    и клиент видит свои изменения, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response) -> None:
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request: HttpRequest) -> None:
+        request.pinned_to_primary = REPLICA_PIN_COOKIE in request.COOKIES
+
+    def process_response(self, request: HttpRequest, response: HttpResponse,
+                         state) -> HttpResponse:
+        if (request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1',
+                max_age=settings.DB_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class RequestMetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Учитывает количество SQL запросов, время БД, сериализации
+    и общее время запроса по имени вьюхи.
+    Отдаёт значения в заголовке Server-Timing и в /metrics,
+    предупреждает в логе о превышении бюджета запросов вьюхи.
+    При REQUEST_METRICS_ENABLED=False не подключается.
+    """
+
+    def __init__(self, get_response) -> None:
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request: HttpRequest) -> tuple:
+        return metrics.start_request()
+
+    def finish(self, request: HttpRequest, state: tuple) -> None:
+        request_metrics, token = state
+        metrics.finish_request(token)
+
+    def process_response(self, request: HttpRequest, response: HttpResponse,
+                         state: tuple) -> HttpResponse:
+        request_metrics, _ = state
+        total_time = request_metrics.total_time
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe(view, request_metrics, total_time)
+
+        response['Server-Timing'] = (
+            f'db;dur={request_metrics.db_time * 1000:.1f};'
+            f'desc="{request_metrics.queries} queries", '
+            f'ser;dur={request_metrics.serializer_time * 1000:.1f}, '
+            f'total;dur={total_time * 1000:.1f}'
+        )
+
+        budget = settings.REQUEST_QUERY_BUDGETS.get(
+            view, settings.REQUEST_QUERY_BUDGET_DEFAULT
+        )
+        if budget and request_metrics.queries > budget:
+            logger.warning(
+                'Query budget exceeded for %s: %d queries (budget %d), '
+                '%s %s',
+                view, request_metrics.queries, budget,
+                request.method, request.get_full_path()
+            )
+        return response
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+
+from foodgram.db_router import replica_reads
+
+
+class ReplicaReadMixin:
+    """
+    Выполняет безопасные запросы указанных действий вьюсета
+    с чтением из реплик, если клиент не закреплён за primary.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request: HttpRequest,
+                 *args, **kwargs) -> HttpResponse:
+        action = self.action_map.get(request.method.lower())
+        if (request.method in SAFE_METHODS
+                and action in self.replica_actions
+                and not getattr(request, 'pinned_to_primary', False)):
+            with replica_reads():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class AnonymousCacheMixin:
+    """
+    Разрешает общим кэшам (nginx) хранить ответы анонимам
+    на API_ANONYMOUS_CACHE_SECONDS секунд.
+    Ответы пользователям с токеном помечаются как private,
+    Vary: Authorization не даёт кэшу отдать один вместо другого.
+    ETag и 304 добавляет ConditionalGetMiddleware.
+    """
+    anonymous_cache_actions = ('list', 'retrieve')
+
+    def finalize_response(self, request: Request, response: HttpResponse,
+                          *args, **kwargs) -> HttpResponse:
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        patch_vary_headers(response, ('Authorization',))
+        if (self.action in self.anonymous_cache_actions
+                and response.status_code == 200
+                and not request.user.is_authenticated
+                and settings.API_ANONYMOUS_CACHE_SECONDS):
+            patch_cache_control(
+                response, public=True,
+                max_age=settings.API_ANONYMOUS_CACHE_SECONDS,
+            )
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class SparseFieldsMixin:
+    """
+    Выборочные поля в ответах на GET.
+    ?fields=id,name - только перечисленные поля, вместо имени можно
+    указать набор из field_presets: ?fields=compact.
+    Поля из expandable_fields при ?fields= отдаются идентификаторами,
+    вложенными объектами - если перечислены в ?expand=author,tags.
+    Без ?fields= ответ полный. Выбранные поля передаются
+    сериализатору в context['fields'] и context['expand'].
+    """
+    field_presets = {}
+    expandable_fields = ()
+
+    def get_sparse_fields(self) -> tuple:
+        """
+        Возвращает (fields, expand), fields None - нужны все поля,
+        expand - поля, которые отдаются вложенными объектами.
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self) -> tuple:
+        query_params = self.request.query_params
+        if (self.request.method not in SAFE_METHODS
+                or not query_params.get('fields')):
+            return None, set(self.expandable_fields)
+        fields = set()
+        for name in query_params['fields'].split(','):
+            fields.update(self.field_presets.get(name.strip(),
+                                                 (name.strip(),)))
+        fields.discard('')
+        expand = {name.strip()
+                  for name in query_params.get('expand', '').split(',')}
+        expand.discard('')
+        errors = {}
+        unknown = fields - set(self.get_serializer_class().Meta.fields)
+        if unknown:
+            errors['fields'] = [f'Неизвестные поля: '
+                                f'{", ".join(sorted(unknown))}.']
+        unknown = expand - set(self.expandable_fields)
+        if unknown:
+            errors['expand'] = [f'Поля нельзя развернуть: '
+                                f'{", ".join(sorted(unknown))}.']
+        if errors:
+            raise ValidationError(errors)
+        return fields, expand
+
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_sparse_fields()
+        return context
@@ -1,5 +1,9 @@
+from django.conf import settings
 from rest_framework.pagination import PageNumberPagination
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    page_size = settings.API_PAGE_SIZE
     page_size_query_param = "limit"
+    # Больший ?limit= обрезается, а не отдаёт весь каталог.
+    max_page_size = settings.API_MAX_PAGE_SIZE
@@ -1,14 +1,69 @@
+import json
+from collections import Counter
+from time import perf_counter
+
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
+from rest_framework.utils import html
 
+from api import metrics
+from api.counters import recipe_views
 from api.fields import Base64ImageField
+from jobs.models import Job
+from jobs.registry import HANDLERS
 from recipes.models import Ingredient, IngredientAmountInRecipe, Recipe, Tag
 
 User = get_user_model()
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """
+    Учитывает время сериализации в метриках запроса.
+    Вложенные сериализаторы не учитываются повторно.
+    """
+
+    def to_representation(self, instance):
+        request_metrics = metrics.get_current()
+        if request_metrics is None or request_metrics.serializer_depth:
+            return super().to_representation(instance)
+        request_metrics.serializer_depth += 1
+        started = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request_metrics.serializer_time += perf_counter() - started
+            request_metrics.serializer_depth -= 1
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Оставляет поля из context['fields'] (см. api.mixins.SparseFieldsMixin).
+    Действует только на корневой сериализатор или элементы корневого
+    списка: вложенные сериализаторы отдают все свои поля.
+    """
+
+    def get_fields(self) -> dict:
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if requested is None or parent is not None:
+            return fields
+        return {name: field for name, field in fields.items()
+                if name in requested}
+
+    def is_expanded(self, field_name: str) -> bool:
+        """Отдаётся ли поле вложенным объектом, а не идентификатором."""
+        return field_name in self.context.get('expand', (field_name,))
+
+
+class CustomUserSerializer(SparseFieldsSerializerMixin,
+                           TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для работы с кастомной моделью пользователей."""
     is_subscribed = SerializerMethodField()
 
@@ -24,11 +79,15 @@ class CustomUserSerializer(serializers.ModelSerializer):
         """
         user = self.context['request'].user
 
-        return (user.is_authenticated
-                and user.subscriber.filter(author=author).exists())
+        if not user.is_authenticated:
+            return False
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return user.subscriber.filter(author=author).exists()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin,
+                    serializers.ModelSerializer):
     """Сериализатор для тегов."""
 
     class Meta:
@@ -36,7 +95,8 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
 
     class Meta:
@@ -44,10 +104,14 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class IngredientAmountInRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор связанной модели для ингредиентов в рецепте."""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
+class IngredientAmountInRecipeSerializer(TimedSerializerMixin,
+                                         serializers.ModelSerializer):
+    """
+    Сериализатор связанной модели для ингредиентов в рецепте.
+    Существование ингредиентов проверяет RecipeSerializer,
+    одним запросом на весь список.
+    """
+    id = serializers.IntegerField(
         source='ingredient.id'
     )
     name = serializers.ReadOnlyField(
@@ -62,17 +126,25 @@ class IngredientAmountInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор для рецептов."""
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
+class RecipeSerializer(SparseFieldsSerializerMixin,
+                       TimedSerializerMixin,
+                       serializers.ModelSerializer):
+    """
+    Сериализатор для рецептов.
+    Теги и ингредиенты загружаются в validate одним запросом
+    на модель, число запросов на запись не зависит от их количества.
+    В multipart/form-data теги и ингредиенты передаются строками JSON.
+    """
+    form_json_fields = ('tags', 'ingredients')
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
     )
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientAmountInRecipeSerializer(many=True)
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField(required=True, allow_null=True)
+    views = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -87,52 +159,150 @@ class RecipeSerializer(serializers.ModelSerializer):
             'image',
             'text',
             'cooking_time',
+            'views',
         )
 
     def get_is_favorited(self, recipe: Recipe) -> bool:
         """Проверяет находится ли рецепт в избранном."""
         user = self.context['request'].user
 
-        return (user.is_authenticated
-                and user.favorites.filter(recipe=recipe).exists())
+        if not user.is_authenticated:
+            return False
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
+        return user.favorites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe: Recipe) -> bool:
         """Проверяет находится ли рецепт в корзине."""
         user = self.context['request'].user
 
-        return (user.is_authenticated
-                and user.shopping_cart.filter(recipe=recipe).exists())
+        if not user.is_authenticated:
+            return False
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
+        return user.shopping_cart.filter(recipe=recipe).exists()
+
+    def get_views(self, recipe: Recipe) -> int:
+        """
+        Просмотры из базы и ещё не записанные просмотры этого
+        процесса, остальные процессы допишут свои в течение
+        RECIPE_VIEWS_FLUSH_SECONDS.
+        """
+        return recipe.views + recipe_views.pending(recipe.pk)
+
+    def to_internal_value(self, data) -> dict:
+        if html.is_html_input(data):
+            data = self._parse_form(data)
+        return super().to_internal_value(data)
+
+    def _parse_form(self, data) -> dict:
+        """Поля формы со строками JSON в словарь для сериализатора."""
+        data = data.dict()
+        errors = {}
+        for field in self.form_json_fields:
+            if field not in data:
+                continue
+            try:
+                data[field] = json.loads(data[field])
+            except ValueError:
+                errors[field] = ['Ожидается строка JSON.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
 
     @staticmethod
-    def _create_ingredients(ingredients: dict, recipe: Recipe) -> None:
-        """Создает список ингредиентов для рецептов."""
-        for ingredient_dict in ingredients:
-            ingredient = ingredient_dict['ingredient']['id']
-            amount = ingredient_dict['amount']
-            IngredientAmountInRecipe.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
+    def _resolve_ids(model: type[models.Model], ids: list) -> tuple:
+        """
+        Загружает объекты по списку id одним запросом.
+        Возвращает словарь {id: объект} и ошибки: id, которых нет
+        в базе, и повторяющиеся id.
+        """
+        objects = model.objects.in_bulk(set(ids))
+        errors = {}
+        missing = sorted({pk for pk in ids if pk not in objects})
+        if missing:
+            errors['missing'] = missing
+        duplicate = sorted(pk for pk, count in Counter(ids).items()
+                           if count > 1)
+        if duplicate:
+            errors['duplicate'] = duplicate
+        return objects, errors
+
+    def validate(self, attrs: dict) -> dict:
+        """
+        Заменяет id тегов и ингредиентов объектами.
+        Ошибки по обоим спискам возвращаются вместе:
+        {"tags": {"missing": [...], "duplicate": [...]},
+         "ingredients": {"missing": [...]}}.
+        """
+        errors = {}
+        if 'tags' in attrs:
+            tags, errors['tags'] = self._resolve_ids(Tag, attrs['tags'])
+            attrs['tags'] = [tags.get(pk) for pk in attrs['tags']]
+        if 'ingredients' in attrs:
+            ids = [item['ingredient']['id'] for item in attrs['ingredients']]
+            ingredients, errors['ingredients'] = self._resolve_ids(
+                Ingredient, ids
             )
+            attrs['ingredients'] = [
+                {'ingredient': ingredients.get(pk), 'amount': item['amount']}
+                for pk, item in zip(ids, attrs['ingredients'])
+            ]
+        errors = {field: error for field, error in errors.items() if error}
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
+    @staticmethod
+    def _set_tags(recipe: Recipe, tags: list, created: bool) -> None:
+        """Сохраняет теги рецепта и кладёт их в кэш для ответа."""
+        if created:
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+            )
+        else:
+            recipe.tags.set(tags)
+        recipe._prefetched_objects_cache['tags'] = sorted(
+            tags, key=lambda tag: tag.name
+        )
+
+    @staticmethod
+    def _create_ingredients(ingredients: list, recipe: Recipe) -> None:
+        """
+        Создает список ингредиентов для рецепта одним запросом
+        и кладёт его в кэш для ответа.
+        """
+        recipe._prefetched_objects_cache['ingredients'] = (
+            IngredientAmountInRecipe.objects.bulk_create(
+                IngredientAmountInRecipe(recipe=recipe, **ingredient)
+                for ingredient in ingredients
+            )
+        )
+
+    @transaction.atomic
     def create(self, validated_data: dict) -> Recipe:
         """Создает рецепт."""
         tags = validated_data.pop('tags')
         author = self.context['request'].user
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags)
+        recipe._prefetched_objects_cache = {}
+        self._set_tags(recipe, tags, created=True)
         self._create_ingredients(ingredients, recipe)
+        # Новый рецепт ещё не может быть в избранном и в корзине.
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
 
         return recipe
 
+    @transaction.atomic
     def update(self, recipe: Recipe, validated_data: dict) -> Recipe:
         """Обновляет рецепт."""
+        if not hasattr(recipe, '_prefetched_objects_cache'):
+            recipe._prefetched_objects_cache = {}
 
         if 'tags' in validated_data:
-            tags = validated_data.pop('tags')
-            recipe.tags.clear()
-            recipe.tags.set(tags)
+            self._set_tags(recipe, validated_data.pop('tags'),
+                           created=False)
 
         if 'ingredients' in validated_data:
             ingredients = validated_data.pop('ingredients')
@@ -148,13 +318,37 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    def get_fields(self) -> dict:
+        fields = super().get_fields()
+        if 'author' in fields and not self.is_expanded('author'):
+            fields['author'] = serializers.PrimaryKeyRelatedField(
+                read_only=True
+            )
+        return fields
+
     def to_representation(self, recipe: Recipe) -> Recipe:
         """Предоставляет рецепт в необходимом для выдачи формате."""
-        self.fields['tags'] = TagSerializer(many=True)
+        # Поле tags для записи - список id, для ответа заменяется один раз.
+        if isinstance(self.fields.get('tags'), serializers.ListField):
+            self.fields['tags'] = (
+                TagSerializer(many=True) if self.is_expanded('tags')
+                else serializers.PrimaryKeyRelatedField(many=True,
+                                                        read_only=True)
+            )
+        # После update DRF сбрасывает кэш prefetch, ингредиенты
+        # загружаются заново вместе с названиями одним запросом.
+        if ('ingredients' in self.fields
+                and 'ingredients' not in getattr(
+                    recipe, '_prefetched_objects_cache', {})):
+            prefetch_related_objects([recipe], Prefetch(
+                'ingredients', queryset=IngredientAmountInRecipe.objects
+                .select_related('ingredient')
+            ))
         return super().to_representation(recipe)
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Сериализатор для рецептов. Компактная версия"""
 
     class Meta:
@@ -180,4 +374,32 @@ class SubscriptionSerializer(CustomUserSerializer):
     @staticmethod
     def get_recipes_count(obj: User) -> int:
         """Показывает количество авторских рецептов пользователя."""
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.all().count()
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для фоновых задач.
+    Задачи с staff_only ставит только администратор.
+    """
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'payload', 'status', 'result', 'error',
+                  'attempts', 'created_at', 'finished_at')
+        read_only_fields = ('status', 'result', 'error', 'attempts',
+                            'created_at', 'finished_at')
+
+    def validate_name(self, name: str) -> str:
+        handler = HANDLERS.get(name)
+        if handler is None:
+            raise serializers.ValidationError(
+                f'Неизвестная задача, доступны: {", ".join(HANDLERS)}'
+            )
+        if handler.staff_only and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError(
+                'Задача доступна только администратору.'
+            )
+        return name
@@ -1,31 +1,157 @@
 from datetime import datetime as dt
+from typing import Iterable
 
-from django.db.models import Sum
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import (DecimalField, Exists, ExpressionWrapper, F,
+                              OuterRef, Prefetch, QuerySet, Sum)
+from django.utils import timezone
 
-from recipes.models import IngredientAmountInRecipe, ShoppingCart
+from recipes.models import (DeletedRecipe, Favorites,
+                            IngredientAmountInRecipe, Recipe, ShoppingCart,
+                            ShoppingCartVersion)
+from recipes.units import format_amount
+from users.models import Subscriptions
 
+User = get_user_model()
 
-def get_shopping_list(user: str) -> str:
-    """Формирует список покупок."""
+# Поля RecipeSerializer, которые читаются из колонок recipes_recipe.
+RECIPE_COLUMNS = {'name', 'image', 'text', 'cooking_time', 'views'}
+
+
+def annotate_is_subscribed(queryset: QuerySet, user: User) -> QuerySet:
+    """Добавляет к пользователям признак подписки текущего пользователя."""
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(is_subscribed=Exists(
+        Subscriptions.objects.filter(user=user, author=OuterRef('pk'))
+    ))
+
+
+def get_recipes_queryset(user: User, fields: set | None = None,
+                         expand: set | None = None) -> QuerySet:
+    """
+    Рецепты со всеми данными для RecipeSerializer.
+    Количество запросов не зависит от числа рецептов на странице.
+    fields и expand - поля ответа (api.mixins.SparseFieldsMixin):
+    для остальных полей не читаются колонки и не выполняются
+    prefetch и подзапросы. None - нужны все поля.
+    """
+    def wanted(field: str) -> bool:
+        return fields is None or field in fields
+
+    queryset = Recipe.objects.all()
+    if fields is not None:
+        queryset = queryset.only(
+            'id', 'author', *(RECIPE_COLUMNS & fields)
+        )
+    if wanted('author') and (expand is None or 'author' in expand):
+        queryset = queryset.prefetch_related(Prefetch(
+            'author',
+            queryset=annotate_is_subscribed(User.objects.all(), user)
+        ))
+    if wanted('ingredients'):
+        queryset = queryset.prefetch_related(Prefetch(
+            'ingredients',
+            queryset=IngredientAmountInRecipe.objects
+            .select_related('ingredient')
+        ))
+    if wanted('tags'):
+        queryset = queryset.prefetch_related('tags')
+    if not user.is_authenticated:
+        return queryset
+    if wanted('is_favorited'):
+        queryset = queryset.annotate(is_favorited=Exists(
+            Favorites.objects.filter(user=user, recipe=OuterRef('pk'))
+        ))
+    if wanted('is_in_shopping_cart'):
+        queryset = queryset.annotate(is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        ))
+    return queryset
+
+
+def get_recipe_changes(queryset: QuerySet, cursor: tuple | None,
+                       until: dt, size: int) -> tuple:
+    """
+    Страница изменений рецептов для /api/recipes/changes/.
+    Рецепты идут в порядке (updated_at, id) после курсора
+    (since, after_id) и не позже until, None - с начала.
+    Возвращает (рецепты, позиция последнего рецепта или None,
+    есть ли следующая страница).
+    """
+    # (updated_at, id) > (since, after_id) в виде, который идёт
+    # по индексу recipe_updated_at_idx.
+    queryset = queryset.filter(updated_at__lte=until)
+    if cursor is not None:
+        since, after_id = cursor
+        queryset = queryset.filter(updated_at__gte=since).exclude(
+            updated_at=since, id__lte=after_id
+        )
+    recipes = list(
+        queryset.annotate(changed_at=F('updated_at'))
+        .order_by('updated_at', 'id')[:size + 1]
+    )
+    more = len(recipes) > size
+    recipes = recipes[:size]
+    last = (recipes[-1].changed_at, recipes[-1].pk) if recipes else None
+    return recipes, last, more
+
+
+def get_deleted_recipes(cursor: tuple, until: dt, size: int) -> tuple:
+    """
+    Страница id удалённых рецептов в порядке (deleted_at, recipe_id)
+    после курсора (since, after_id) и не позже until, по индексу
+    deleted_recipe_deleted_at_idx. Возвращает то же, что
+    get_recipe_changes.
+    """
+    since, after_id = cursor
+    rows = list(
+        DeletedRecipe.objects.filter(
+            deleted_at__gte=since, deleted_at__lte=until
+        ).exclude(
+            deleted_at=since, recipe_id__lte=after_id
+        ).order_by('deleted_at', 'recipe_id').values_list(
+            'deleted_at', 'recipe_id'
+        )[:size + 1]
+    )
+    more = len(rows) > size
+    rows = rows[:size]
+    return ([recipe_id for _, recipe_id in rows],
+            rows[-1] if rows else None, more)
+
+
+def get_shopping_list(user: User, modified: dt | None = None) -> str:
+    """
+    Формирует список покупок, modified - дата в заголовке файла.
+    Количества одного ингредиента в разных единицах складываются
+    в базе в канонической единице (recipes.units) одним запросом.
+    """
     recipes = (ShoppingCart.objects.filter(user=user)
                .values('recipe__name'))
     recipes_list = (f'{recipe["recipe__name"]}\n' for recipe in recipes)
+    canonical_amount = ExpressionWrapper(
+        F('amount') * F('ingredient__unit_factor'),
+        output_field=DecimalField(max_digits=20, decimal_places=4),
+    )
     ingredients = (IngredientAmountInRecipe.objects.filter(
         recipe__shopping_cart__user=user
-    ).values('ingredient__name', 'ingredient__measurement_unit')
-     .annotate(sum_amount=Sum('amount'))
+    ).values('ingredient__name', 'ingredient__canonical_unit')
+     .annotate(sum_amount=Sum(canonical_amount))
      .order_by('ingredient__name'))
     ingredients_list = (
         f'{ingredient["ingredient__name"]}: '
-        f'{ingredient["sum_amount"]} '
-        f'{ingredient["ingredient__measurement_unit"]}.\n'
+        + format_amount(ingredient['sum_amount'],
+                        ingredient['ingredient__canonical_unit'])
+        + '.\n'
         for ingredient in ingredients
     )
     shopping_list = [
         f'Foodgram, «Продуктовый помощник»\n'
         f'Список ингредиентов для приготовления рецептов.\n\n'
         f'Подготовлен для: {user.get_full_name()}\n'
-        f'Дата: {dt.now().strftime("%d/%m/%Y %H:%M")}\n\n'
+        f'Дата: {(modified or dt.now()).strftime("%d/%m/%Y %H:%M")}\n\n'
         'Список покупок:\n'
         '------------------------------------------------\n'
     ]
@@ -44,3 +170,54 @@ def get_shopping_list(user: str) -> str:
     shopping_list = ''.join(shopping_list)
 
     return shopping_list
+
+
+def get_shopping_cart_version(user: User) -> int:
+    """
+    Версия списка покупок пользователя - время последнего изменения
+    корзины в микросекундах (ShoppingCartVersion), один запрос
+    на чтение. Пока корзина не менялась, версия - дата регистрации.
+    """
+    updated_at = ShoppingCartVersion.objects.filter(
+        user=user
+    ).values_list('updated_at', flat=True).first() or user.date_joined
+    return int(updated_at.timestamp() * 1_000_000)
+
+
+def bump_shopping_cart_versions(users: QuerySet | Iterable[int]) -> int:
+    """
+    Меняет версии списков покупок пользователей, users - id или
+    QuerySet с ними. Вызывается в транзакции изменения.
+    Версия есть у каждого, у кого что-то лежит в корзине:
+    её создаёт add_shopping_cart_version.
+    """
+    return ShoppingCartVersion.objects.filter(user__in=users).update(
+        updated_at=timezone.now()
+    )
+
+
+def add_shopping_cart_version(user_id: int) -> None:
+    """
+    Меняет версию списка покупок при добавлении в корзину,
+    создаёт её при первом добавлении.
+    """
+    updated_at = timezone.now()
+    if not ShoppingCartVersion.objects.filter(user_id=user_id).update(
+        updated_at=updated_at
+    ):
+        ShoppingCartVersion.objects.bulk_create(
+            [ShoppingCartVersion(user_id=user_id, updated_at=updated_at)],
+            ignore_conflicts=True,
+        )
+
+
+def get_cached_shopping_list(user: User, version: int) -> str:
+    """Список покупок из кэша, сформированный для версии корзины."""
+    key = f'shopping_list:{user.pk}:{version}'
+    shopping_list = cache.get(key)
+    if shopping_list is None:
+        shopping_list = get_shopping_list(
+            user, modified=dt.fromtimestamp(version / 1_000_000)
+        )
+        cache.set(key, shopping_list, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return shopping_list
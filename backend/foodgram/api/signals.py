@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache_key
+from api.events import publish_on_commit
+from api.services import (add_shopping_cart_version,
+                          bump_shopping_cart_versions)
+from jobs.registry import enqueue_batched
+from recipes.models import (DeletedRecipe, Ingredient, Recipe, ShoppingCart,
+                            Tag, touch_recipes)
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance: Token, **kwargs) -> None:
+    """Сбрасывает кэш токена при выходе пользователя."""
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance: User, created: bool,
+                           update_fields=None, **kwargs) -> None:
+    """
+    Сбрасывает кэш токенов пользователя при изменении учётной записи:
+    смене пароля, деактивации и правке данных.
+    """
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def invalidate_shopping_list_on_add(sender, instance: ShoppingCart,
+                                    **kwargs) -> None:
+    """Меняет версию списка покупок при добавлении в корзину."""
+    add_shopping_cart_version(instance.user_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_list(sender, instance: ShoppingCart,
+                             **kwargs) -> None:
+    """
+    Меняет версию списка покупок при удалении из корзины.
+    Версию не создаёт: при удалении пользователя её строка
+    уже удалена каскадом.
+    """
+    bump_shopping_cart_versions((instance.user_id,))
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_shopping_lists(sender, instance: Recipe,
+                                     created: bool, **kwargs) -> None:
+    """
+    Меняет версии списков покупок, в которых есть изменённый рецепт.
+    Ингредиенты меняются в одной транзакции с сохранением рецепта,
+    и в API, и в админке.
+    """
+    if created:
+        return
+    bump_shopping_cart_versions(
+        ShoppingCart.objects.filter(recipe=instance).values('user_id')
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def record_deleted_recipe(sender, instance: Recipe, **kwargs) -> None:
+    """Оставляет запись об удалении для /api/recipes/changes/."""
+    DeletedRecipe.objects.create(recipe_id=instance.pk)
+    publish_on_commit(f'recipe:{instance.pk}',
+                      {'type': 'recipe_deleted', 'recipe': instance.pk})
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe_saved(sender, instance: Recipe, created: bool,
+                         **kwargs) -> None:
+    """
+    Событие о новом рецепте подписчикам автора, об изменённом -
+    пользователям, у которых он в избранном (api.events).
+    """
+    if created:
+        publish_on_commit(f'author:{instance.author_id}', {
+            'type': 'recipe_created',
+            'recipe': instance.pk,
+            'author': instance.author_id,
+            'name': instance.name,
+        })
+    else:
+        publish_on_commit(f'recipe:{instance.pk}',
+                          {'type': 'recipe_updated', 'recipe': instance.pk})
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance: Tag, created: bool = False,
+                      **kwargs) -> None:
+    """Рецепты с изменённым или удаляемым тегом становятся изменёнными."""
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance: Ingredient,
+                             created: bool = False, **kwargs) -> None:
+    """
+    Рецепты с изменённым или удаляемым ингредиентом становятся
+    изменёнными.
+    """
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients__ingredient=instance))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_similar_recipes(sender, instance: Recipe, **kwargs) -> None:
+    """
+    Ставит пересчёт похожих рецептов: ингредиенты сохраняются
+    вместе с рецептом, воркер увидит их после фиксации транзакции.
+    Рецепт добавляется в ещё не взятую задачу similar_recipes, новая
+    задача ставится, только если такой нет.
+    """
+    enqueue_batched('similar_recipes', 'recipes', [instance.pk])
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from urllib.parse import quote
+
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.counters import recipe_views
+from benchmarks import datagen
+from recipes.models import Ingredient, Recipe, Tag
+
+
+class FilledDatabaseMixin:
+    """
+    Тестовая база, наполненная benchmarks.datagen.
+    Картинки пишутся во временный MEDIA_ROOT, чтобы не оставаться
+    в media/. Ограничение частоты запросов на время проверок снято.
+    """
+    users = 300
+    recipes = 1000
+    subscriptions_per_user = 20
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root,
+                                     THROTTLE_USER_RATE=0,
+                                     THROTTLE_ANON_RATE=0)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        # Просмотры записываются, пока тестовая база ещё существует.
+        cls.addClassCleanup(recipe_views.flush)
+        super().setUpClass()
+
+    @classmethod
+    def fill_database(cls) -> tuple:
+        """Наполняет базу, возвращает пользователя, токен и context."""
+        datagen.generate(users=cls.users, recipes=cls.recipes,
+                         subscriptions_per_user=cls.subscriptions_per_user)
+        return build_context()
+
+
+class FilledDatabaseTestCase(FilledDatabaseMixin, TestCase):
+    """Данные создаются один раз на класс."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user, cls.token, cls.context = cls.fill_database()
+
+
+def build_context() -> tuple:
+    """Выбирает пользователя и объекты, по которым идут проверки."""
+    user = (datagen.User.objects.filter(username__startswith='bench_')
+            .order_by('id').first())
+    token = Token.objects.create(user=user)
+    subscribed = set(user.subscriber.values_list('author_id', flat=True))
+    new_author = (datagen.User.objects.exclude(pk=user.pk)
+                  .exclude(pk__in=subscribed).order_by('id').first())
+    carted = set(user.shopping_cart.values_list('recipe_id', flat=True))
+    favorited = set(user.favorites.values_list('recipe_id', flat=True))
+    other_recipe = (Recipe.objects.exclude(pk__in=carted | favorited)
+                    .order_by('id').first())
+    tag = Tag.objects.order_by('id').first()
+    context = {
+        'tag': tag.pk,
+        'tag_slug': tag.slug,
+        'ingredient': Ingredient.objects.order_by('id').first().pk,
+        # Рецепт с длинным списком: запросов столько же, сколько
+        # с одним ингредиентом.
+        'tags': list(Tag.objects.values_list('id', flat=True)),
+        'ingredients': [
+            {'id': pk, 'amount': 5}
+            for pk in Ingredient.objects.order_by('id')
+            .values_list('id', flat=True)[:20]
+        ],
+        'recipe': Recipe.objects.order_by('id').first().pk,
+        # 50 рецептов вразнобой и один несуществующий id.
+        'batch_ids': ','.join(str(pk) for pk in (
+            list(Recipe.objects.order_by('?').values_list('id', flat=True)
+                 [:50]) + [0]
+        )),
+        # Время, после которого изменились 50 рецептов.
+        'changes_since': quote(
+            Recipe.objects.order_by('-updated_at')[50].updated_at.isoformat()
+        ),
+        'other_recipe': other_recipe.pk,
+        'author': Recipe.objects.order_by('id').first().author_id,
+        'new_author': new_author.pk,
+        'email': user.email,
+    }
+    return user, token, context
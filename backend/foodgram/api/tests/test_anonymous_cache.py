@@ -0,0 +1,46 @@
+"""
+Заголовки, по которым nginx кэширует ответы анонимам.
+Сам микрокэш (proxy_cache_lock) проверяет benchmarks.nginx_burst
+против gateway из infra/.
+"""
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.tests.base import FilledDatabaseTestCase
+
+
+@override_settings(API_ANONYMOUS_CACHE_SECONDS=10)
+class AnonymousCacheTests(FilledDatabaseTestCase):
+    users = 20
+    recipes = 60
+    subscriptions_per_user = 5
+
+    def test_anonymous_lists_are_public(self) -> None:
+        for path in ('/api/recipes/', '/api/recipes/{recipe}/',
+                     '/api/recipes/{recipe}/similar/',
+                     '/api/tags/', '/api/ingredients/?name=мук'):
+            with self.subTest(path):
+                response = APIClient().get(path.format(**self.context))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=10', response['Cache-Control'])
+                self.assertIn('Authorization', response['Vary'])
+
+    def test_authenticated_responses_are_private(self) -> None:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for path in ('/api/recipes/', '/api/recipes/{recipe}/'):
+            with self.subTest(path):
+                response = client.get(path.format(**self.context))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertNotIn('public', response['Cache-Control'])
+
+    def test_other_actions_are_private(self) -> None:
+        response = APIClient().get(
+            '/api/recipes/changes/?updated_since={changes_since}'.format(
+                **self.context
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
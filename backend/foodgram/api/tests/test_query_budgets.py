@@ -0,0 +1,340 @@
+"""
+Бюджет SQL запросов эндпоинтов API.
+
+Для каждого маршрута api/urls.py число запросов сравнивается
+с бюджетом, анонимно и с токеном. Для списков проверяется, что число
+запросов не растёт с размером страницы. Маршрут api без бюджета
+и без записи в UNCHECKED_ROUTES роняет RouteCoverageTests.
+"""
+from collections import defaultdict
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.base import FilledDatabaseMixin
+from benchmarks import datagen
+from jobs.models import Job
+from jobs.worker import claim, run_job
+from recipes.models import Recipe
+
+PAGE_SIZES = (1, 10, 50)
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+         'AAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class Check(NamedTuple):
+    """
+    Проверка маршрута.
+    anon и auth - бюджеты запросов для анонима и пользователя с токеном,
+    None - вариант не проверяется.
+    """
+    name: str
+    method: str
+    path: str
+    anon: int | None
+    auth: int | None
+    paged: bool = False
+    data: dict | None = None
+    status: int | None = None
+
+
+TAG_CHECKS = (
+    Check('tags-list', 'get', '/api/tags/', 1, 1),
+    Check('tags-detail', 'get', '/api/tags/{tag}/', 1, 1),
+    Check('ingredients-list', 'get', '/api/ingredients/?name=мук', 1, 1),
+    Check('ingredients-detail', 'get', '/api/ingredients/{ingredient}/',
+          1, 1),
+)
+
+RECIPE_READ_CHECKS = (
+    Check('recipes-list', 'get', '/api/recipes/', 5, 5, paged=True),
+    Check('recipes-list-filtered', 'get',
+          '/api/recipes/?tags={tag_slug}&is_favorited=1'
+          '&is_in_shopping_cart=0', 6, 6, paged=True),
+    Check('recipes-list-author', 'get', '/api/recipes/?author={author}',
+          5, 5, paged=True),
+    Check('recipes-list-compact', 'get', '/api/recipes/?fields=compact',
+          2, 2, paged=True),
+    Check('recipes-list-trending', 'get', '/api/recipes/?ordering=trending',
+          5, 5, paged=True),
+    Check('recipes-detail', 'get', '/api/recipes/{recipe}/', 4, 4),
+    Check('recipes-batch', 'get', '/api/recipes/batch/?ids={recipe}', 4, 4),
+    Check('recipes-batch', 'get', '/api/recipes/batch/?ids={batch_ids}',
+          4, 4),
+    Check('recipes-similar', 'get', '/api/recipes/{recipe}/similar/', 1, 1),
+    Check('recipes-changes', 'get',
+          '/api/recipes/changes/?updated_since={changes_since}', 5, 5),
+)
+
+SHOPPING_CART_CHECKS = (
+    # Скачивание только читает версию корзины, повторное отдаёт
+    # список из кэша по версии.
+    Check('recipes-download-shopping-cart', 'get',
+          '/api/recipes/download_shopping_cart/', 0, 3),
+    Check('recipes-download-shopping-cart', 'get',
+          '/api/recipes/download_shopping_cart/', 0, 1),
+    Check('recipes-shopping-cart', 'post',
+          '/api/recipes/{other_recipe}/shopping_cart/', 0, 4, status=201),
+    Check('recipes-shopping-cart', 'delete',
+          '/api/recipes/{other_recipe}/shopping_cart/', 0, 6, status=204),
+)
+
+RECIPE_WRITE_CHECKS = (
+    Check('recipes-favorite', 'post', '/api/recipes/{other_recipe}/favorite/',
+          0, 3, status=201),
+    Check('recipes-favorite', 'delete',
+          '/api/recipes/{other_recipe}/favorite/', 0, 4, status=204),
+    # Запись рецепта добавляет его в очередную задачу similar_recipes.
+    Check('recipes-list', 'post', '/api/recipes/', 0, 9, status=201,
+          data={'name': 'Проверка бюджета', 'text': 'Текст',
+                'cooking_time': 10, 'image': IMAGE, 'tags': ['{tag}'],
+                'ingredients': [{'id': '{ingredient}', 'amount': 10}]}),
+    Check('recipes-list', 'post', '/api/recipes/', 0, 9, status=201,
+          data={'name': 'Проверка бюджета 20', 'text': 'Текст',
+                'cooking_time': 10, 'image': IMAGE, 'tags': '{tags}',
+                'ingredients': '{ingredients}'}),
+    Check('recipes-detail', 'patch', '/api/recipes/{created_recipe}/',
+          0, 17, status=200,
+          data={'name': 'Проверка бюджета 2', 'tags': ['{tag}'],
+                'ingredients': [{'id': '{ingredient}', 'amount': 20}]}),
+    Check('recipes-detail', 'patch', '/api/recipes/{created_recipe}/',
+          0, 17, status=200,
+          data={'tags': '{tags}', 'ingredients': '{ingredients}'}),
+    Check('recipes-detail', 'delete', '/api/recipes/{created_recipe}/',
+          0, 14, status=204),
+)
+
+USER_CHECKS = (
+    Check('api-root', 'get', '/api/', 0, 0),
+    Check('users-list', 'get', '/api/users/', 2, 2, paged=True),
+    Check('users-detail', 'get', '/api/users/{author}/', 0, 1),
+    Check('users-me', 'get', '/api/users/me/', 0, 1),
+    Check('users-subscriptions', 'get', '/api/users/subscriptions/', 0, 3,
+          paged=True),
+    Check('users-subscriptions-compact', 'get',
+          '/api/users/subscriptions/?fields=id,username,recipes_count',
+          0, 2, paged=True),
+    Check('users-subscribe', 'post', '/api/users/{new_author}/subscribe/',
+          0, 6, status=201),
+    Check('users-subscribe', 'delete', '/api/users/{new_author}/subscribe/',
+          0, 4, status=204),
+    Check('users-set-password', 'post', '/api/users/set_password/', 0, 2,
+          status=204,
+          data={'current_password': datagen.PASSWORD,
+                'new_password': datagen.PASSWORD}),
+    # Адрес без пользователя: письмо со ссылкой требует
+    # PASSWORD_RESET_CONFIRM_URL и USERNAME_RESET_CONFIRM_URL в DJOSER,
+    # которые в проекте не заданы.
+    Check('users-reset-password', 'post', '/api/users/reset_password/',
+          1, 1, status=204, data={'email': 'nobody@foodgram.test'}),
+    Check('users-reset-password-confirm', 'post',
+          '/api/users/reset_password_confirm/', 1, 1, status=400,
+          data={'uid': 'MA', 'token': 'invalid',
+                'new_password': datagen.PASSWORD}),
+    Check('users-reset-username', 'post', '/api/users/reset_email/',
+          1, 1, status=204, data={'email': 'nobody@foodgram.test'}),
+    Check('users-reset-username-confirm', 'post',
+          '/api/users/reset_email_confirm/', 2, 2, status=400,
+          data={'uid': 'MA', 'token': 'invalid',
+                'new_email': 'budget2@foodgram.test'}),
+    Check('users-activation', 'post', '/api/users/activation/', 1, 1,
+          status=400, data={'uid': 'MA', 'token': 'invalid'}),
+    Check('users-resend-activation', 'post',
+          '/api/users/resend_activation/', 1, 1, status=400,
+          data={'email': '{email}'}),
+    # Меняет адрес пользователя, поэтому последняя.
+    Check('users-set-username', 'post', '/api/users/set_email/', 0, 3,
+          status=204,
+          data={'current_password': datagen.PASSWORD,
+                'new_email': 'budget@foodgram.test'}),
+)
+
+AUTH_CHECKS = (
+    Check('login', 'post', '/api/auth/token/login/', 3, None, status=200,
+          data={'email': '{email}', 'password': datagen.PASSWORD}),
+    Check('logout', 'post', '/api/auth/token/logout/', 0, 3, status=204),
+)
+
+JOB_CHECKS = (
+    Check('jobs-list', 'post', '/api/jobs/', 0, 1, status=201,
+          data={'name': 'shopping_list'}),
+    Check('jobs-list', 'get', '/api/jobs/', 0, 2, paged=True),
+    Check('jobs-detail', 'get', '/api/jobs/{created_job}/', 0, 1),
+    Check('jobs-download', 'get', '/api/jobs/{created_job}/download/', 0, 1,
+          status=200),
+)
+
+CHECKS = (TAG_CHECKS + RECIPE_READ_CHECKS + SHOPPING_CART_CHECKS
+          + RECIPE_WRITE_CHECKS + USER_CHECKS + AUTH_CHECKS + JOB_CHECKS)
+
+# Маршруты без бюджета. djoser.urls регистрирует те же адреса
+# под именами user-*, но раньше их перехватывают маршруты users-*
+# роутера api, до этих вьюх запрос не доходит.
+UNCHECKED_ROUTES = {
+    'user-list', 'user-detail', 'user-me', 'user-activation',
+    'user-resend-activation', 'user-set-password', 'user-set-username',
+    'user-reset-password', 'user-reset-password-confirm',
+    'user-reset-username', 'user-reset-username-confirm',
+}
+
+
+def fill(value, context: dict):
+    """
+    Подставляет идентификаторы из context в шаблон запроса.
+    Строка из одного ключа, например '{tags}', заменяется значением
+    из context целиком.
+    """
+    if (isinstance(value, str) and value.startswith('{')
+            and value.endswith('}') and value[1:-1] in context):
+        return context[value[1:-1]]
+    if isinstance(value, str):
+        filled = value.format(**context)
+        return int(filled) if filled.isdigit() and value != filled else filled
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    return value
+
+
+def count_queries(client: APIClient, check: Check, context: dict,
+                  path: str) -> tuple:
+    """Выполняет запрос и возвращает число запросов и статус ответа."""
+    data = fill(check.data, context) if check.data else None
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, check.method)(
+            fill(path, context), data=data, format='json'
+        )
+    return len(queries), response.status_code
+
+
+def api_route_names(patterns: list | None = None,
+                    namespace: str | None = None) -> set:
+    """Имена маршрутов в пространстве имён api."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= api_route_names(pattern.url_patterns,
+                                     pattern.namespace or namespace)
+        elif namespace == 'api' and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def route_name(path: str) -> str:
+    """Имя маршрута шаблона пути, параметры заменяются на 1."""
+    path = urlsplit(path.format_map(defaultdict(lambda: '1'))).path
+    return resolve(path).url_name
+
+
+class RouteCoverageTests(SimpleTestCase):
+
+    def test_every_api_route_has_budget(self) -> None:
+        checked = {route_name(check.path) for check in CHECKS}
+        self.assertEqual(
+            api_route_names() - checked - UNCHECKED_ROUTES, set(),
+            'add a Check or a commented entry in UNCHECKED_ROUTES'
+        )
+
+
+class QueryBudgetTests(FilledDatabaseMixin, TransactionTestCase):
+    """
+    Проверки группы идут одна за другой: запись создаётся POST
+    и меняется следующими PATCH и DELETE.
+    TransactionTestCase - запросы записи идут в своих транзакциях
+    и on_commit выполняется, как в работающем сервисе. База
+    наполняется заново для каждой группы.
+    """
+    users = 100
+    recipes = 300
+    subscriptions_per_user = 50
+
+    def setUp(self) -> None:
+        self.user, self.token, self.context = self.fill_database()
+
+    def test_tags_and_ingredients(self) -> None:
+        self.check_budgets(TAG_CHECKS)
+
+    def test_recipe_reads(self) -> None:
+        self.check_budgets(RECIPE_READ_CHECKS)
+
+    def test_shopping_cart(self) -> None:
+        self.check_budgets(SHOPPING_CART_CHECKS)
+
+    def test_recipe_writes(self) -> None:
+        self.check_budgets(RECIPE_WRITE_CHECKS)
+
+    def test_users(self) -> None:
+        self.check_budgets(USER_CHECKS)
+
+    def test_auth(self) -> None:
+        self.check_budgets(AUTH_CHECKS)
+
+    def test_jobs(self) -> None:
+        self.check_budgets(JOB_CHECKS)
+
+    def check_budgets(self, checks: tuple) -> None:
+        token, context = self.token, self.context
+        for check in checks:
+            for role, budget in (('anon', check.anon),
+                                 ('auth', check.auth)):
+                if budget is None:
+                    continue
+                client = APIClient()
+                if role == 'auth':
+                    client.credentials(
+                        HTTP_AUTHORIZATION=f'Token {token.key}'
+                    )
+                    # Прогрев кэша токенов, как у активного пользователя.
+                    client.get('/api/users/me/')
+                if check.paged:
+                    separator = '&' if '?' in check.path else '?'
+                    paths = [f'{check.path}{separator}limit={size}'
+                             for size in PAGE_SIZES]
+                else:
+                    paths = [check.path]
+                counts = []
+                with self.subTest(method=check.method, name=check.name,
+                                  path=check.path, role=role):
+                    for path in paths:
+                        count, status = count_queries(client, check,
+                                                      context, path)
+                        counts.append(count)
+                        if role == 'auth' and check.status:
+                            self.assertEqual(status, check.status)
+                        self.remember_created(check, role, context)
+                    self.assertLessEqual(max(counts), budget)
+                    self.assertEqual(len(set(counts)), 1,
+                                     f'grows with page size {PAGE_SIZES}: '
+                                     f'{counts}')
+                if check.name == 'logout' and role == 'auth':
+                    token = Token.objects.create(user=self.user)
+
+    def remember_created(self, check: Check, role: str,
+                         context: dict) -> None:
+        """
+        Запоминает созданные проверкой рецепт и задачу.
+        Задача сразу выполняется, чтобы был файл для download.
+        """
+        if check.method != 'post' or role != 'auth':
+            return
+        if check.name == 'recipes-list':
+            context['created_recipe'] = (
+                Recipe.objects.filter(author=self.user)
+                .order_by('-id').values_list('id', flat=True).first()
+            )
+        if check.name == 'jobs-list':
+            context['created_job'] = (
+                Job.objects.filter(user=self.user)
+                .values_list('id', flat=True).first()
+            )
+            run_job(claim('budget'))
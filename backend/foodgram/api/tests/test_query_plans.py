@@ -0,0 +1,148 @@
+"""
+Планы горячих запросов: запросы идут по индексам.
+
+Для запросов RecipeViewSet, UserViewSet.subscriptions
+и get_shopping_list смотрится EXPLAIN каждого SQL запроса. Проверка
+не проходит, если большая таблица читается целиком (SCAN без индекса
+в SQLite, Seq Scan в PostgreSQL) или в планах нет ожидаемого индекса.
+
+На маленькой базе PostgreSQL охотно выбирает Seq Scan, поэтому
+для EXPLAIN он отключается (enable_seqscan = off): Seq Scan в плане
+остаётся только там, где подходящего индекса нет.
+"""
+import re
+from typing import Callable, NamedTuple
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.services import get_shopping_list
+from api.tests.base import FilledDatabaseTestCase
+from recipes.models import Favorites, RecipeBand, ShoppingCart
+from recipes.similarity import band_candidates
+from users.models import Subscriptions
+
+# Таблицы, которые растут с числом пользователей и рецептов.
+LARGE_TABLES = (
+    'recipes_recipe', 'recipes_favorites', 'recipes_shoppingcart',
+    'recipes_ingredientamountinrecipe', 'recipes_recipe_tags',
+    'users_subscriptions', 'users_user', 'recipes_deletedrecipe',
+    'recipes_similarrecipe', 'recipes_recipeband',
+)
+FULL_SCAN = {
+    'sqlite': re.compile(r'^SCAN (\w+)$'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+class PlanCheck(NamedTuple):
+    """
+    Проверка планов запросов.
+    path - запрос к API от пользователя с токеном, query - функция
+    от (user, context), выполняющая запросы; indexes - индексы,
+    которые должны встретиться в планах.
+    """
+    name: str
+    indexes: tuple
+    path: str | None = None
+    query: Callable | None = None
+
+
+CHECKS = (
+    PlanCheck('recipes-list', ('recipe_pub_date_idx',
+                               'ingredient_amount_recipe_idx'),
+              path='/api/recipes/?limit=10'),
+    PlanCheck('recipes-list-author', ('recipe_author_pub_date_idx',),
+              path='/api/recipes/?author={author}&limit=10'),
+    PlanCheck('recipes-list-trending', ('trending_recipe_score_idx',),
+              path='/api/recipes/?ordering=trending&limit=10'),
+    PlanCheck('recipes-list-favorited', (),
+              path='/api/recipes/?is_favorited=1&limit=10'),
+    PlanCheck('recipes-list-in-cart', (),
+              path='/api/recipes/?is_in_shopping_cart=1&limit=10'),
+    PlanCheck('recipes-detail', ('ingredient_amount_recipe_idx',),
+              path='/api/recipes/{recipe}/'),
+    PlanCheck('recipes-similar', ('similar_recipe_score_idx',),
+              path='/api/recipes/{recipe}/similar/'),
+    PlanCheck('recipes-changes', ('recipe_updated_at_idx',
+                                  'deleted_recipe_deleted_at_idx'),
+              path='/api/recipes/changes/?updated_since={changes_since}'),
+    PlanCheck('users-subscriptions', ('recipe_author_pub_date_idx',),
+              path='/api/users/subscriptions/?limit=10'),
+    PlanCheck('get_shopping_list', ('ingredient_amount_recipe_idx',),
+              query=lambda user, context: get_shopping_list(user)),
+    # Кандидаты в похожие после изменения рецепта.
+    PlanCheck('similar-band-candidates', ('recipe_band_key_idx',),
+              query=lambda user, context: band_candidates(
+                  RecipeBand.objects.filter(recipe=context['recipe'])
+                  .values_list('key', flat=True))),
+    # Обратные направления: счётчик в админке и каскадное удаление.
+    PlanCheck('favorites-by-recipe', ('favorites_recipe_user_idx',),
+              query=lambda user, context: Favorites.objects.filter(
+                  recipe=context['recipe']).count()),
+    PlanCheck('shopping-cart-by-recipe', ('shopping_cart_recipe_user_idx',),
+              query=lambda user, context: ShoppingCart.objects.filter(
+                  recipe=context['recipe']).count()),
+    PlanCheck('subscribers-of-author', ('subscriptions_author_user_idx',),
+              query=lambda user, context: Subscriptions.objects.filter(
+                  author=context['author']).count()),
+)
+
+
+def explain(sql: str) -> list:
+    """Строки плана запроса."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [str(row[-1]).strip() for row in cursor.fetchall()]
+
+
+def capture(check: PlanCheck, client: APIClient, user,
+            context: dict) -> tuple:
+    """
+    Выполняет проверку, возвращает код ответа (200 для query)
+    и SQL выполненных SELECT.
+    """
+    status = 200
+    with CaptureQueriesContext(connection) as queries:
+        if check.path:
+            status = client.get(check.path.format(**context)).status_code
+        else:
+            check.query(user, context)
+    return status, [query['sql'] for query in queries.captured_queries
+                    if query['sql'].startswith('SELECT')]
+
+
+@skipUnless(connection.vendor in FULL_SCAN,
+            f'EXPLAIN checks are not implemented for {connection.vendor}')
+class QueryPlanTests(FilledDatabaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_query_plans(self) -> None:
+        full_scan = FULL_SCAN[connection.vendor]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for check in CHECKS:
+            with self.subTest(check.name):
+                status, queries = capture(check, client, self.user,
+                                          self.context)
+                self.assertEqual(status, 200)
+                used = set()
+                for sql in queries:
+                    for line in explain(sql):
+                        used.update(index for index in check.indexes
+                                    if index in line)
+                        match = full_scan.search(line)
+                        self.assertFalse(
+                            match and match.group(1) in LARGE_TABLES,
+                            f'full scan: {line}: {sql[:200]}'
+                        )
+                self.assertEqual(set(check.indexes) - used, set())
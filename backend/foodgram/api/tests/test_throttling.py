@@ -0,0 +1,92 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.throttling import CostRateThrottle
+
+BURST = 10
+
+
+class SlowCache:
+    """
+    Кэш с задержкой перед каждой операцией, как у сетевого memcached:
+    одновременные запросы успевают перемежаться.
+    """
+
+    def __getattr__(self, name: str):
+        method = getattr(cache, name)
+
+        def call(*args, **kwargs):
+            time.sleep(0.001)
+            return method(*args, **kwargs)
+        return call
+
+
+def anonymous_request(address: str = '10.0.0.1') -> SimpleNamespace:
+    return SimpleNamespace(user=AnonymousUser(),
+                           META={'REMOTE_ADDR': address})
+
+
+# Окно в 10 минут: все запросы теста попадают в одно окно.
+@override_settings(THROTTLE_ANON_RATE=1, THROTTLE_BURST=BURST)
+class CostRateThrottleTests(SimpleTestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def allow(self, request=None, view=None) -> bool:
+        return CostRateThrottle().allow_request(
+            request or anonymous_request(), view or SimpleNamespace()
+        )
+
+    def test_concurrent_requests_spend_at_most_burst(self) -> None:
+        clients = 50
+        barrier = threading.Barrier(clients)
+        allowed = []
+
+        def send() -> None:
+            barrier.wait()
+            allowed.append(self.allow())
+
+        threads = [threading.Thread(target=send) for _ in range(clients)]
+        with mock.patch('api.throttling.cache', SlowCache()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), BURST)
+
+    def test_cost_is_spent_from_the_window(self) -> None:
+        view = SimpleNamespace(action='create', throttle_costs={'create': 4})
+        self.assertTrue(self.allow(view=view))
+        self.assertTrue(self.allow(view=view))
+        self.assertFalse(self.allow(view=view))
+        # Отказ не расходует токены: обычные запросы ещё проходят.
+        self.assertTrue(self.allow())
+        self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+
+    def test_clients_have_separate_windows(self) -> None:
+        for _ in range(BURST):
+            self.assertTrue(self.allow())
+        self.assertFalse(self.allow())
+        self.assertTrue(self.allow(anonymous_request('10.0.0.2')))
+
+    def test_wait_lasts_until_the_next_window(self) -> None:
+        throttle = CostRateThrottle()
+        for _ in range(BURST):
+            self.allow()
+        self.assertFalse(throttle.allow_request(anonymous_request(),
+                                                SimpleNamespace()))
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), BURST * 60)
+
+    @override_settings(THROTTLE_ANON_RATE=0)
+    def test_zero_rate_disables_the_limit(self) -> None:
+        for _ in range(BURST * 2):
+            self.assertTrue(self.allow())
@@ -0,0 +1,65 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+
+def throttle_cache_key(ident: str, window: int) -> str:
+    return f'throttle:{ident}:{window}'
+
+
+class CostRateThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов счётчиком токенов в кэше.
+    У каждого пользователя, а у анонима - у IP адреса, на окно
+    в THROTTLE_BURST / rate минут приходится THROTTLE_BURST токенов,
+    rate - THROTTLE_USER_RATE или THROTTLE_ANON_RATE токенов в минуту.
+    Запрос стоит throttle_costs[action] вьюхи, по умолчанию 1 токен:
+    тяжёлые действия расходуют окно быстрее. Отказ - 429
+    с Retry-After до начала следующего окна.
+    Токены списываются cache.incr, который в memcached и redis
+    атомарен: из одновременных запросов клиента проходят не больше
+    THROTTLE_BURST. С кэшем в памяти процесса счётчики у каждого
+    воркера свои.
+    """
+
+    def allow_request(self, request: Request, view) -> bool:
+        if request.user.is_authenticated:
+            rate = settings.THROTTLE_USER_RATE
+            ident = f'user:{request.user.pk}'
+        else:
+            rate = settings.THROTTLE_ANON_RATE
+            ident = f'ip:{self.get_ident(request)}'
+        if not rate:
+            return True
+        burst = settings.THROTTLE_BURST
+        period = burst / rate * 60
+        cost = min(self.get_cost(view), burst)
+        now = time.time()
+        window = int(now // period)
+        key = throttle_cache_key(ident, window)
+        timeout = math.ceil(period) + 1
+        cache.add(key, 0, timeout)
+        try:
+            spent = cache.incr(key, cost)
+        except ValueError:
+            # Счётчик истёк между add и incr.
+            spent = cost if cache.add(key, cost, timeout) else burst + 1
+        if spent > burst:
+            # Отказ не расходует токены.
+            cache.decr(key, cost)
+            self.wait_seconds = (window + 1) * period - now
+            return False
+        return True
+
+    @staticmethod
+    def get_cost(view) -> int:
+        return getattr(view, 'throttle_costs', {}).get(
+            getattr(view, 'action', None), 1
+        )
+
+    def wait(self) -> float:
+        return self.wait_seconds
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import HttpRequest
+from rest_framework import exceptions, status
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл слишком большой.'
+    default_code = 'upload_too_large'
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Прерывает загрузку файла, как только он превысил max_size байт,
+    не дожидаясь конца запроса. Ставится первым в upload_handlers,
+    остальные обработчики получают уже проверенные части файла.
+    """
+
+    def __init__(self, request: HttpRequest | None = None,
+                 max_size: int | None = None) -> None:
+        super().__init__(request)
+        self.max_size = max_size or settings.UPLOAD_IMAGE_MAX_SIZE
+
+    def new_file(self, *args, **kwargs) -> None:
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > self.max_size:
+            self.raise_too_large()
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> bytes:
+        if start + len(raw_data) > self.max_size:
+            self.raise_too_large()
+        return raw_data
+
+    def file_complete(self, file_size: int) -> None:
+        return None
+
+    def raise_too_large(self) -> None:
+        raise UploadTooLarge(
+            f'Файл {self.file_name} больше '
+            f'{self.max_size // 2 ** 20} МБ.'
+        )
@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.async_views import make_async_urlpatterns
+from api.views import (IngredientViewSet, JobViewSet, RecipeViewSet,
+                       TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -10,9 +13,24 @@ router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('users', UserViewSet, basename='users')
+router_v1.register('jobs', JobViewSet, basename='jobs')
+
+# Нагруженные эндпоинты на чтение, которые при работе по ASGI
+# выполняются в пуле потоков, не блокируя цикл событий.
+ASYNC_ROUTES = (
+    'tags-list',
+    'ingredients-list',
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+)
+
+router_urls = router_v1.urls
+if settings.ASYNC_API_VIEWS:
+    router_urls = make_async_urlpatterns(router_urls, ASYNC_ROUTES)
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
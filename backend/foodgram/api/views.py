@@ -1,28 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import Count, QuerySet
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
+from api.counters import recipe_views
 from api.filters import IngredientSearchFilter, RecipeFilters
+from api.mixins import (AnonymousCacheMixin, ReplicaReadMixin,
+                        SparseFieldsMixin)
 from api.paginators import LimitPageNumberPagination
 from api.permissions import IsAdminOwnerOrReadOnly
-from api.serializers import (IngredientSerializer, RecipeSerializer,
-                             ShortRecipeSerializer, SubscriptionSerializer,
-                             TagSerializer)
-from api.services import get_shopping_list
+from api.serializers import (IngredientSerializer, JobSerializer,
+                             RecipeSerializer, ShortRecipeSerializer,
+                             SubscriptionSerializer, TagSerializer)
+from api.services import (annotate_is_subscribed, get_cached_shopping_list,
+                          get_deleted_recipes, get_recipe_changes,
+                          get_recipes_queryset, get_shopping_cart_version)
+from api.uploads import MaxSizeUploadHandler
+from jobs.models import Job
 from recipes.models import Favorites, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Subscriptions
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AnonymousCacheMixin, ReplicaReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """
     Вьюсет для тегов.
     Получение тега или списка тегов.
@@ -32,7 +52,8 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, ReplicaReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """
     Вьюсет для ингредиентов.
     Получение ингредиента или списка ингредиентов.
@@ -45,7 +66,8 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('name',)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, ReplicaReadMixin,
+                    SparseFieldsMixin, viewsets.ModelViewSet):
     """
     Вьюсет для рецептов.
     Получение рецепта или списка рецептов доступно для всех пользователей.
@@ -56,15 +78,199 @@ class RecipeViewSet(viewsets.ModelViewSet):
     - добавление, удаление рецепта из списка покупок;
     - скачивание списка ингредиентов в txt файле;
     - добавление, удаление рецепта из избранного.
+    Картинка принимается строкой base64 в JSON или файлом
+    в multipart/form-data, тогда теги и ингредиенты передаются
+    строками JSON.
+    Для карточек: ?fields=compact, автор и теги отдаются id,
+    пока не перечислены в ?expand=.
+    Несколько рецептов по id - batch/?ids=1,2,3, изменения для
+    синхронизации клиентов - changes/?updated_since=, похожие
+    по ингредиентам - {id}/similar/.
     """
-    queryset = (Recipe.objects.select_related('author')
-                .prefetch_related('ingredients')
-                .prefetch_related('tags'))
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilters
     permission_classes = [IsAdminOwnerOrReadOnly]
     pagination_class = LimitPageNumberPagination
+    parser_classes = (JSONParser, MultiPartParser)
+    field_presets = {
+        'compact': ('id', 'name', 'image', 'cooking_time',
+                    'is_favorited', 'is_in_shopping_cart'),
+    }
+    expandable_fields = ('author', 'tags')
+    replica_actions = ('list', 'retrieve', 'batch', 'similar')
+    anonymous_cache_actions = ('list', 'retrieve', 'batch', 'similar')
+    # Стоимость действий в токенах api.throttling, остальные - 1.
+    throttle_costs = {
+        'create': 5,
+        'update': 5,
+        'partial_update': 5,
+        'batch': 3,
+        'changes': 3,
+        'download_shopping_cart': 10,
+    }
+
+    def initialize_request(self, request: HttpRequest,
+                           *args, **kwargs) -> Request:
+        # Файл сразу пишется во временный файл частями по 64 КБ,
+        # в памяти не держится, загрузка больше лимита обрывается.
+        request.upload_handlers = [MaxSizeUploadHandler(request),
+                                   TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet:
+        return get_recipes_queryset(self.request.user,
+                                    *self.get_sparse_fields())
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Рецепт, просмотр засчитывается в буфер api.counters.
+        Ответы анонимам из кэша nginx до приложения не доходят
+        и не засчитываются.
+        """
+        recipe = self.get_object()
+        recipe_views.add(recipe.pk)
+        return Response(self.get_serializer(recipe).data)
+
+    @action(methods=['get'], detail=False)
+    def batch(self, request: Request) -> Response:
+        """
+        Несколько рецептов по ?ids=3,1,2 за один запрос.
+        Рецепты отдаются в порядке ids, с теми же prefetch, что у списка,
+        id, которых нет, перечисляются в missing.
+        """
+        ids = self._parse_ids(request.query_params.get('ids', ''))
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
+    @staticmethod
+    def _parse_ids(value: str) -> list:
+        """Список id без повторов, в порядке запроса."""
+        try:
+            ids = [int(pk) for pk in value.split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError(
+                {'ids': ['Ожидаются целые числа через запятую.']}
+            )
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise ValidationError({'ids': ['Укажите id рецептов.']})
+        if len(ids) > settings.RECIPES_BATCH_MAX_IDS:
+            raise ValidationError({'ids': [
+                f'Не больше {settings.RECIPES_BATCH_MAX_IDS} id за запрос.'
+            ]})
+        return ids
+
+    @action(methods=['get'], detail=True)
+    def similar(self, request: Request, pk: str) -> Response:
+        """
+        Похожие по ингредиентам рецепты из SimilarRecipe, одним
+        запросом по индексу. Для рецепта без похожих и для
+        несуществующего рецепта - пустой список.
+        """
+        if not pk.isdigit():
+            raise Http404
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).only(
+            'id', 'name', 'image', 'cooking_time'
+        ).order_by('-similar_to__score')
+        return Response(ShortRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        ).data)
+
+    @action(methods=['get'], detail=False)
+    def changes(self, request: Request) -> Response:
+        """
+        Рецепты, изменённые после ?updated_since=, и id удалённых.
+        Клиент проходит по next, пока он не станет null, и запоминает
+        updated_until для следующей синхронизации. Без updated_since
+        отдаются все рецепты. Рецепты и удалённые идут страницами
+        с отдельными курсорами: after_id и deleted_since,
+        deleted_after_id в next.
+        Изменения последних RECIPES_CHANGES_LAG секунд не отдаются:
+        updated_at ставится до фиксации транзакции, и рецепт
+        с меньшим updated_at может появиться в базе позже.
+        Записи об удалении хранятся RECIPES_DELETED_RETENTION_DAYS
+        дней, с более старым updated_since нужна полная загрузка.
+        """
+        params = request.query_params
+        cursor = self._parse_changes_cursor(params, 'updated_since',
+                                            'after_id')
+        deleted_cursor = self._parse_changes_cursor(
+            params, 'deleted_since', 'deleted_after_id'
+        ) or cursor
+        now = timezone.now()
+        if deleted_cursor is not None and deleted_cursor[0] < now - timedelta(
+                days=settings.RECIPES_DELETED_RETENTION_DAYS):
+            raise ValidationError({'updated_since': [
+                'Изменения хранятся '
+                f'{settings.RECIPES_DELETED_RETENTION_DAYS} дней, '
+                'загрузите рецепты заново без updated_since.'
+            ]})
+        until = now - timedelta(seconds=settings.RECIPES_CHANGES_LAG)
+        if cursor is not None:
+            until = max(until, cursor[0], deleted_cursor[0])
+        size = settings.RECIPES_CHANGES_PAGE_SIZE
+        recipes, last, more = get_recipe_changes(self.get_queryset(),
+                                                 cursor, until, size)
+        deleted, last_deleted, more_deleted = [], None, False
+        if deleted_cursor is not None:
+            deleted, last_deleted, more_deleted = get_deleted_recipes(
+                deleted_cursor, until, size
+            )
+        next_url = None
+        if more or more_deleted:
+            # Каждый поток продолжается с последней отданной позиции,
+            # закончившийся на следующей странице пуст.
+            cursor = last or cursor
+            deleted_cursor = last_deleted or deleted_cursor
+            next_url = request.build_absolute_uri()
+            for name, value in (
+                ('updated_since', cursor and cursor[0].isoformat()),
+                ('after_id', cursor and cursor[1]),
+                ('deleted_since', deleted_cursor
+                 and deleted_cursor[0].isoformat()),
+                ('deleted_after_id', deleted_cursor and deleted_cursor[1]),
+            ):
+                if value is not None:
+                    next_url = replace_query_param(next_url, name, value)
+        return Response({
+            'results': self.get_serializer(recipes, many=True).data,
+            'deleted': deleted,
+            'next': next_url,
+            'updated_until': None if next_url else until.isoformat(),
+        })
+
+    @staticmethod
+    def _parse_changes_cursor(params: dict, time_param: str,
+                              id_param: str) -> tuple | None:
+        """Курсор (время, id) из параметров запроса или None."""
+        since = params.get(time_param)
+        if since is None:
+            return None
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None:
+            raise ValidationError({time_param: [
+                'Ожидается дата в формате ISO 8601, '
+                '+ в смещении пояса кодируется как %2B.'
+            ]})
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        try:
+            after_id = int(params.get(id_param, 0))
+        except ValueError:
+            raise ValidationError({id_param: ['Ожидается целое число.']})
+        return since, after_id
 
     @action(
         methods=['post', 'delete'],
@@ -98,12 +304,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request: Request) -> HttpResponse:
-        """Скачивание списка ингредиентов в txt файле."""
-        shopping_list = get_shopping_list(user=request.user)
+        """
+        Скачивание списка ингредиентов в txt файле.
+        Файл кэшируется по версии корзины, повторный запрос
+        с If-None-Match или If-Modified-Since получает 304.
+        """
+        version = get_shopping_cart_version(request.user)
+        last_modified = version // 1_000_000
         filename = f'{request.user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list,
-                                content_type='text/plain; charset=utf-8')
+        response = HttpResponse(content_type='text/plain; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['ETag'] = f'"{version}"'
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        response = get_conditional_response(
+            request, etag=response['ETag'], last_modified=last_modified,
+            response=response,
+        )
+        if response.status_code == status.HTTP_200_OK:
+            response.content = get_cached_shopping_list(request.user,
+                                                        version)
         return response
 
     @action(
@@ -133,15 +353,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(SparseFieldsMixin, DjoserUserViewSet):
     """
     Вьюсет для расширения функционала работы с пользователями.
     Зарегистрированные пользователи могут:
     - подписываться на других пользователей и удалять свою подписку;
     - просматривать список своих подписок.
+    Поля ответа выбираются через ?fields=.
     """
     pagination_class = LimitPageNumberPagination
 
+    def get_serializer_class(self) -> type:
+        if self.action in ('subscribe', 'subscriptions'):
+            return SubscriptionSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self) -> QuerySet:
+        return self.trim_users(super().get_queryset())
+
+    def trim_users(self, queryset: QuerySet) -> QuerySet:
+        """Убирает из запроса колонки и подзапросы ненужных полей."""
+        fields = self.get_sparse_fields()[0]
+        if fields is not None:
+            queryset = queryset.only(
+                'id', *(fields & {'email', 'username', 'first_name',
+                                  'last_name'})
+            )
+        if fields is None or 'is_subscribed' in fields:
+            queryset = annotate_is_subscribed(queryset, self.request.user)
+        return queryset
+
     @action(
         methods=['post', 'delete'],
         detail=True,
@@ -162,7 +403,6 @@ class UserViewSet(DjoserUserViewSet):
         if request.method == 'POST':
             if not subscription.exists():
                 Subscriptions.objects.create(user=user, author=author)
-                self.serializer_class = SubscriptionSerializer
                 serializer = self.get_serializer(author)
                 return Response(data=serializer.data,
                                 status=status.HTTP_201_CREATED)
@@ -189,10 +429,42 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request: Request) -> Response:
         """Возвращает список авторов на которых подписан пользователь."""
-        user = request.user
-        queryset = User.objects.filter(signed__user=user)
+        fields = self.get_sparse_fields()[0]
+        queryset = self.trim_users(
+            User.objects.filter(signed__user=request.user).order_by('-id')
+        )
+        if fields is None or 'recipes_count' in fields:
+            queryset = queryset.annotate(recipes_count=Count('recipes'))
+        if fields is None or 'recipes' in fields:
+            queryset = queryset.prefetch_related('recipes')
         subscriptions = self.paginate_queryset(queryset)
-        self.serializer_class = SubscriptionSerializer
         serializer = self.get_serializer(subscriptions, many=True)
 
         return self.get_paginated_response(serializer.data)
+
+
+class JobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Вьюсет для фоновых задач.
+    Пользователь ставит задачу и опрашивает её статус,
+    готовый файл результата отдаётся через download.
+    """
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = LimitPageNumberPagination
+    throttle_costs = {'create': 10}
+
+    def get_queryset(self) -> QuerySet:
+        return Job.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer: JobSerializer) -> None:
+        serializer.save(user=self.request.user)
+
+    @action(methods=['get'], detail=True)
+    def download(self, request: Request, pk: int | str) -> FileResponse:
+        """Файл результата выполненной задачи."""
+        job = self.get_object()
+        if job.status != Job.Status.DONE or not job.file:
+            raise Http404('Файл результата не готов.')
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=job.result.get('filename'))
@@ -0,0 +1,36 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def setup_django() -> None:
+    """Настраивает Django для запуска бенчмарков как скриптов."""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+
+
+@contextmanager
+def test_environment():
+    """
+    Тестовая база и временный MEDIA_ROOT на время замеров,
+    чтобы загруженные картинки не оставались в media/.
+    Ограничение частоты запросов на время замеров снято.
+    """
+    from django.test.utils import (override_settings, setup_databases,
+                                   setup_test_environment,
+                                   teardown_databases,
+                                   teardown_test_environment)
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root,
+                                   THROTTLE_USER_RATE=0,
+                                   THROTTLE_ANON_RATE=0):
+                yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
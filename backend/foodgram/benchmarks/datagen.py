@@ -0,0 +1,178 @@
+"""
+Генератор синтетических данных для проверок и бенчмарков.
+Ингредиенты и теги загружаются из data/, остальное создаётся
+пачками через bulk_create.
+
+Наполнение базы из настроек проекта:
+    python -m benchmarks.datagen --users 1000 --recipes 20000 \
+        --favorites-per-user 50 --cart-per-user 15
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from benchmarks import setup_django
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from recipes.models import (Favorites, Ingredient,  # noqa: E402
+                            IngredientAmountInRecipe, Recipe, ShoppingCart,
+                            ShoppingCartVersion, SimilarRecipe, Tag,
+                            TrendingRecipe)
+from recipes.similarity import rebuild_similar  # noqa: E402
+from recipes.trending import compute_trending  # noqa: E402
+from users.models import Subscriptions  # noqa: E402
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+PASSWORD = 'foodgram-benchmark'
+
+
+def _sample_pairs(rng: random.Random, left: list, right: list,
+                  per_left: int, exclude_self: bool = False) -> list:
+    """Случайные уникальные пары (left, right), per_left на каждый left."""
+    pairs = []
+    for item in left:
+        candidates = rng.sample(right, min(per_left + 1, len(right)))
+        chosen = [other for other in candidates
+                  if not (exclude_self and other == item)][:per_left]
+        pairs.extend((item, other) for other in chosen)
+    return pairs
+
+
+def generate(users: int = 200, recipes: int = 2000,
+             ingredients_per_recipe: int = 8, tags_per_recipe: int = 2,
+             subscriptions_per_user: int = 20, favorites_per_user: int = 30,
+             cart_per_user: int = 10, seed: int = 0) -> dict:
+    """
+    Наполняет базу данными заданного размера.
+    Возвращает количество созданных объектов по моделям.
+    """
+    rng = random.Random(seed)
+    if not Ingredient.objects.exists():
+        call_command('import_ingredients', verbosity=0)
+    if not Tag.objects.exists():
+        call_command('import_tags', verbosity=0)
+
+    password = make_password(PASSWORD)
+    first_user = User.objects.filter(username__startswith='bench_').count()
+    User.objects.bulk_create(
+        (User(username=f'bench_{first_user + number}',
+              email=f'bench_{first_user + number}@foodgram.test',
+              first_name='Bench', last_name=f'User {number}',
+              password=password)
+         for number in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench_')
+                    .values_list('id', flat=True))
+
+    first_recipe = Recipe.objects.count()
+    Recipe.objects.bulk_create(
+        (Recipe(name=f'Рецепт {first_recipe + number}',
+                author_id=rng.choice(user_ids),
+                text='Описание рецепта. ' * rng.randint(5, 50),
+                cooking_time=rng.randint(1, 180),
+                image='recipes/images/benchmark.png')
+         for number in range(recipes)),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.order_by('-id')
+                      .values_list('id', flat=True)[:recipes])
+
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    IngredientAmountInRecipe.objects.bulk_create(
+        (IngredientAmountInRecipe(recipe_id=recipe_id,
+                                  ingredient_id=ingredient_id,
+                                  amount=rng.randint(1, 500))
+         for recipe_id, ingredient_id in _sample_pairs(
+            rng, recipe_ids, ingredient_ids, ingredients_per_recipe)),
+        batch_size=BATCH_SIZE,
+    )
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    RecipeTags = Recipe.tags.through
+    RecipeTags.objects.bulk_create(
+        (RecipeTags(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id, tag_id in _sample_pairs(
+            rng, recipe_ids, tag_ids, tags_per_recipe)),
+        batch_size=BATCH_SIZE,
+    )
+
+    Subscriptions.objects.bulk_create(
+        (Subscriptions(user_id=user_id, author_id=author_id)
+         for user_id, author_id in _sample_pairs(
+            rng, user_ids, user_ids, subscriptions_per_user,
+            exclude_self=True)),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    # Добавления в избранное и корзину за последние две недели.
+    now = timezone.now()
+
+    def added_at() -> datetime:
+        return now - timedelta(seconds=rng.randint(0, 14 * 24 * 3600))
+
+    Favorites.objects.bulk_create(
+        (Favorites(user_id=user_id, recipe_id=recipe_id, added_at=added_at())
+         for user_id, recipe_id in _sample_pairs(
+            rng, user_ids, recipe_ids, favorites_per_user)),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    ShoppingCart.objects.bulk_create(
+        (ShoppingCart(user_id=user_id, recipe_id=recipe_id,
+                      added_at=added_at())
+         for user_id, recipe_id in _sample_pairs(
+            rng, user_ids, recipe_ids, cart_per_user)),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    # bulk_create не шлёт сигналы: версии корзин создаются здесь.
+    ShoppingCartVersion.objects.bulk_create(
+        (ShoppingCartVersion(user_id=user_id, updated_at=now)
+         for user_id in ShoppingCart.objects.filter(
+            user__in=user_ids).values_list('user_id', flat=True).distinct()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    # Рецепты правились в разное время за последний месяц:
+    # bulk_update, в отличие от save(), не трогает auto_now.
+    Recipe.objects.bulk_update(
+        (Recipe(pk=recipe_id, updated_at=now - timedelta(
+            seconds=rng.randint(60, 30 * 24 * 3600)))
+         for recipe_id in recipe_ids),
+        ('updated_at',), batch_size=BATCH_SIZE,
+    )
+    rebuild_similar()
+    compute_trending()
+
+    return {
+        model.__name__: model.objects.count()
+        for model in (User, Ingredient, Tag, Recipe,
+                      IngredientAmountInRecipe, Subscriptions,
+                      Favorites, ShoppingCart, SimilarRecipe,
+                      TrendingRecipe)
+    }
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--tags-per-recipe', type=int, default=2)
+    parser.add_argument('--subscriptions-per-user', type=int, default=20)
+    parser.add_argument('--favorites-per-user', type=int, default=30)
+    parser.add_argument('--cart-per-user', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sizes = generate(**vars(args))
+    for model, count in sizes.items():
+        print(f'{model}: {count}')
+
+
+if __name__ == '__main__':
+    main()
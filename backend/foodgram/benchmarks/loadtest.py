@@ -0,0 +1,167 @@
+"""
+Нагрузочный тест HTTP эндпоинтов Foodgram.
+
+Запуск:
+    python -m benchmarks.loadtest http://127.0.0.1:8000/api/recipes/ \
+        -c 16 -n 2000 --json after.json
+    python -m benchmarks.loadtest --compare before.json after.json
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks import results
+
+
+def percentile(values: list, percent: float) -> float:
+    """Возвращает перцентиль по отсортированному списку значений."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(latencies: list) -> dict:
+    """Сводка по задержкам в миллисекундах."""
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else 0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p90_ms': round(percentile(latencies, 90), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+class Worker:
+    """
+    Клиент с постоянным HTTP соединением.
+    Каждый поток держит своё соединение, как это делает браузер
+    или мобильный клиент.
+    """
+
+    def __init__(self, url: str, token: str | None = None) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path + (f'?{parts.query}' if parts.query else '')
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Token {token}'
+        self.connection = None
+
+    def request(self, method: str = 'GET', path: str | None = None,
+                body: dict | None = None) -> tuple[float, int, bytes]:
+        """Выполняет запрос, возвращает время ответа в мс, статус и тело."""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=30
+            )
+        headers = self.headers
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers = {**headers, 'Content-Type': 'application/json'}
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path or self.path,
+                                    body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                self.connection.close()
+                self.connection = None
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            status, content = 0, b''
+        return (time.perf_counter() - started) * 1000, status, content
+
+
+def run(url: str, concurrency: int, requests: int,
+        token: str | None = None, warmup: int = 0) -> dict:
+    """Нагружает url и возвращает сводку по задержкам."""
+    local = threading.local()
+    counter = iter(range(requests + warmup))
+    lock = threading.Lock()
+    latencies, errors = [], 0
+
+    def job() -> None:
+        nonlocal errors
+        if not hasattr(local, 'worker'):
+            local.worker = Worker(url, token)
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            elapsed, status, _ = local.worker.request()
+            if number < warmup:
+                continue
+            with lock:
+                if 200 <= status < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(job)
+    duration = time.perf_counter() - started
+
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'rps': round(len(latencies) / duration, 1) if duration else 0,
+        **summarize(latencies),
+    }
+
+
+def print_summary(result: dict) -> None:
+    print(f"{result['url']}  c={result['concurrency']}  "
+          f"n={result['requests']}  errors={result['errors']}")
+    print(f"  rps={result['rps']}  mean={result['mean_ms']}ms  "
+          f"p50={result['p50_ms']}ms  p90={result['p90_ms']}ms  "
+          f"p99={result['p99_ms']}ms")
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('url', nargs='?',
+                        default='http://127.0.0.1:8000/api/recipes/')
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100,
+                        help='requests excluded from the statistics')
+    parser.add_argument('--token', help='auth token for the requests')
+    parser.add_argument('--json', dest='json_path',
+                        help='write the summary to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two saved summaries and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        results.compare(*args.compare)
+        return
+
+    result = run(args.url, args.concurrency, args.requests,
+                 token=args.token, warmup=args.warmup)
+    print_summary(result)
+    if args.json_path:
+        results.write(args.json_path, 'loadtest',
+                      {f"{args.url} c={args.concurrency}": result})
+    if result['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Микробенчмарки горячих путей API на синтетических данных.
+
+Создаёт тестовую базу, наполняет её через benchmarks.datagen и замеряет
+get_shopping_list, IngredientSearchFilter, сериализацию списка рецептов
+(полного и карточек ?fields=compact), декодирование Base64ImageField
+и цепочку middleware. Результаты пишутся в JSON для сравнения
+между коммитами.
+
+Запуск:
+    cd backend/foodgram
+    python -m benchmarks.micro --recipes 5000 --json micro.json
+    python -m benchmarks.results before.json micro.json
+"""
+import argparse
+import base64
+import io
+import random
+import statistics
+from time import perf_counter
+
+from benchmarks import setup_django, test_environment
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.exceptions import MiddlewareNotUsed  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils.module_loading import import_string  # noqa: E402
+from PIL import Image  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api.fields import Base64ImageField  # noqa: E402
+from api.filters import IngredientSearchFilter  # noqa: E402
+from api.serializers import RecipeSerializer  # noqa: E402
+from api.services import get_recipes_queryset, get_shopping_list  # noqa: E402
+from api.views import RecipeViewSet  # noqa: E402
+from benchmarks import datagen, results  # noqa: E402
+from benchmarks.loadtest import summarize  # noqa: E402
+from recipes.models import Ingredient  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Регистрирует функцию подготовки замера под именем name."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def measure(func, repeat: int, warmup: int = 2) -> dict:
+    """Замеряет func repeat раз, считая и SQL запросы последнего вызова."""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        timings.append((perf_counter() - started) * 1000)
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        **summarize(timings),
+        'queries': len(queries),
+    }
+
+
+def make_request(path: str, user, **params) -> Request:
+    request = Request(APIRequestFactory().get(path, params))
+    request.user = user
+    return request
+
+
+@benchmark('get_shopping_list')
+def shopping_list(user, page_size: int):
+    return lambda: get_shopping_list(user)
+
+
+@benchmark('ingredient_search')
+def ingredient_search(user, page_size: int):
+    search = IngredientSearchFilter()
+    request = make_request('/api/ingredients/', user, name='мук')
+    return lambda: list(search.filter_queryset(
+        request, Ingredient.objects.all(), None
+    ))
+
+
+@benchmark('recipe_list_serialize')
+def recipe_list_serialize(user, page_size: int):
+    request = make_request('/api/recipes/', user)
+
+    def run():
+        recipes = get_recipes_queryset(user)[:page_size]
+        return RecipeSerializer(recipes, many=True,
+                                context={'request': request}).data
+    return run
+
+
+@benchmark('recipe_list_render')
+def recipe_list_render(user, page_size: int):
+    serialize = recipe_list_serialize(user, page_size)
+    renderer = JSONRenderer()
+    return lambda: renderer.render(serialize())
+
+
+@benchmark('recipe_cards_render')
+def recipe_cards_render(user, page_size: int):
+    """Страница карточек: ?fields=compact, выборка и сериализация."""
+    request = make_request('/api/recipes/', user, fields='compact')
+    fields = set(RecipeViewSet.field_presets['compact'])
+    renderer = JSONRenderer()
+
+    def run():
+        recipes = get_recipes_queryset(user, fields, set())[:page_size]
+        return renderer.render(RecipeSerializer(
+            recipes, many=True,
+            context={'request': request, 'fields': fields, 'expand': set()},
+        ).data)
+    return run
+
+
+@benchmark('base64_image_decode')
+def base64_image_decode(user, page_size: int):
+    rng = random.Random(0)
+    image = Image.frombytes('RGB', (800, 600), rng.randbytes(800 * 600 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    data = ('data:image/jpeg;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+    field = Base64ImageField()
+    return lambda: field.to_internal_value(data)
+
+
+def middleware_chain():
+    """Цепочка settings.MIDDLEWARE вокруг вьюхи, которая ничего не делает."""
+    def view(request):
+        return HttpResponse()
+    handler = view
+    for path in reversed(settings.MIDDLEWARE):
+        try:
+            handler = import_string(path)(handler)
+        except MiddlewareNotUsed:
+            pass
+    return handler
+
+
+@benchmark('middleware_api')
+def middleware_api(user, page_size: int):
+    handler = middleware_chain()
+    factory = RequestFactory()
+    return lambda: handler(factory.get('/api/recipes/'))
+
+
+@benchmark('middleware_admin')
+def middleware_admin(user, page_size: int):
+    handler = middleware_chain()
+    factory = RequestFactory()
+    return lambda: handler(factory.get('/admin/'))
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--cart-per-user', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', action='append', choices=BENCHMARKS,
+                        help='run only this benchmark, may be repeated')
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args(argv)
+
+    with test_environment():
+        sizes = datagen.generate(users=args.users, recipes=args.recipes,
+                                 cart_per_user=args.cart_per_user)
+        user = (datagen.User.objects.filter(username__startswith='bench_')
+                .order_by('id').first())
+        summary = {}
+        for name in args.only or BENCHMARKS:
+            summary[name] = measure(BENCHMARKS[name](user, args.page_size),
+                                    args.repeat)
+            print(f"{name:<24} median={summary[name]['median_ms']}ms "
+                  f"p90={summary[name]['p90_ms']}ms "
+                  f"queries={summary[name]['queries']}")
+        if args.json_path:
+            results.write(args.json_path, 'micro', summary, sizes=sizes,
+                          page_size=args.page_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Проверка микрокэша nginx: всплески анонимных запросов к ленте.
+
+Каждый всплеск - concurrency одновременных запросов. Сколько из них
+дошло до Django, считается на стороне Django: по разнице счётчика
+foodgram_request_duration_seconds_count вьюхи (--view) в /metrics
+до и после прогона (REQUEST_METRICS_ENABLED=True). Без метрик
+счёт идёт по заголовку X-Cache-Status: MISS, EXPIRED, BYPASS
+и STALE - устаревший ответ, за которым nginx обновляет запись
+фоновым запросом. С proxy_cache_lock на ключ должен приходиться
+один такой запрос за время жизни ответа (--ttl), код возврата 1,
+если их больше.
+
+Запуск против nginx из infra/:
+    python -m benchmarks.nginx_burst http://127.0.0.1:8000/api/recipes/ \
+        --concurrency 50 --bursts 10 --interval 2 --ttl 10
+"""
+import argparse
+import http.client
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks import results
+
+# Статусы $upstream_cache_status, при которых запрос ушёл в Django:
+# STALE отдаёт устаревший ответ и запускает фоновое обновление,
+# UPDATING отдаёт его, пока обновление уже идёт, без запроса в Django.
+UPSTREAM_STATUSES = ('MISS', 'EXPIRED', 'BYPASS', 'STALE')
+REQUESTS_METRIC = 'foodgram_request_duration_seconds'
+
+
+def django_requests(metrics_url: str, view: str) -> float | None:
+    """
+    Число запросов к вьюхе, обработанных Django, по /metrics.
+    None, если метрики недоступны.
+    """
+    parts = urlsplit(metrics_url)
+    connection = http.client.HTTPConnection(parts.hostname,
+                                            parts.port or 80, timeout=30)
+    try:
+        connection.request('GET', parts.path)
+        response = connection.getresponse()
+        body = response.read().decode()
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+    if response.status != 200:
+        return None
+    for family in text_string_to_metric_families(body):
+        if family.name != REQUESTS_METRIC:
+            continue
+        return sum(sample.value for sample in family.samples
+                   if sample.name == f'{REQUESTS_METRIC}_count'
+                   and sample.labels.get('view') == view)
+    return 0.0
+
+
+def fetch(url: str) -> tuple[int, str]:
+    """Анонимный GET, возвращает код ответа и X-Cache-Status."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname,
+                                            parts.port or 80, timeout=30)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    try:
+        connection.request('GET', path,
+                           headers={'Accept': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader('X-Cache-Status', '-')
+    except (OSError, http.client.HTTPException):
+        return 0, 'ERROR'
+    finally:
+        connection.close()
+
+
+def burst(url: str, concurrency: int) -> Counter:
+    """Отправляет concurrency запросов одновременно."""
+    barrier = threading.Barrier(concurrency)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def job() -> None:
+        barrier.wait()
+        status, cache_status = fetch(url)
+        with lock:
+            statuses[cache_status if status == 200
+                     else f'HTTP {status}'] += 1
+
+    threads = [threading.Thread(target=job) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def run(url: str, concurrency: int, bursts: int, interval: float,
+        ttl: float, metrics_url: str, view: str) -> dict:
+    """Гоняет всплески и сравнивает число промахов с ожидаемым."""
+    total = Counter()
+    per_burst = []
+    before = django_requests(metrics_url, view)
+    started = time.monotonic()
+    for number in range(bursts):
+        statuses = burst(url, concurrency)
+        per_burst.append(dict(statuses))
+        total.update(statuses)
+        print(f'burst {number + 1:>3}: ' + ', '.join(
+            f'{key}={value}' for key, value in sorted(statuses.items())))
+        if number + 1 < bursts:
+            time.sleep(interval)
+    duration = time.monotonic() - started
+    # Фоновое обновление после STALE может закончиться после ответа.
+    time.sleep(1)
+    after = django_requests(metrics_url, view)
+    if before is None or after is None:
+        source = 'X-Cache-Status'
+        upstream = sum(total[status] for status in UPSTREAM_STATUSES)
+    else:
+        source = 'metrics'
+        upstream = int(after - before)
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'bursts': bursts,
+        'duration_s': round(duration, 1),
+        'ttl_s': ttl,
+        'statuses': dict(total),
+        'upstream': upstream,
+        'upstream_source': source,
+        # Каждое окно ttl может начаться с промаха.
+        'upstream_limit': math.ceil(duration / ttl) + 1,
+        'per_burst': per_burst,
+    }
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('url', nargs='?',
+                        default='http://127.0.0.1:8000/api/recipes/')
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('--bursts', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=2,
+                        help='seconds between bursts')
+    parser.add_argument('--ttl', type=float, default=10,
+                        help='API_ANONYMOUS_CACHE_SECONDS of the backend')
+    parser.add_argument('--metrics-url',
+                        help='Django metrics, /metrics of the url host '
+                             'by default')
+    parser.add_argument('--view', default='api:recipes-list',
+                        help='view name of the url in the metrics')
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args(argv)
+
+    parts = urlsplit(args.url)
+    metrics_url = (args.metrics_url
+                   or f'{parts.scheme}://{parts.netloc}/metrics')
+    summary = run(args.url, args.concurrency, args.bursts, args.interval,
+                  args.ttl, metrics_url, args.view)
+    if summary['upstream_source'] != 'metrics':
+        print(f'No metrics at {metrics_url}, counting by X-Cache-Status: '
+              'enable REQUEST_METRICS_ENABLED for an exact count.')
+    print(f"requests to Django ({summary['upstream_source']}): "
+          f"{summary['upstream']} "
+          f"(limit {summary['upstream_limit']} for "
+          f"{summary['duration_s']}s at ttl={args.ttl}s)")
+    if args.json_path:
+        results.write(args.json_path, 'nginx_burst', {args.url: summary})
+    if '-' in summary['statuses']:
+        print('No X-Cache-Status header: is the request going through '
+              'nginx with infra/nginx.conf?')
+        sys.exit(1)
+    if summary['upstream'] > summary['upstream_limit']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Сохранение результатов бенчмарков в JSON и сравнение прогонов.
+
+Запуск:
+    python -m benchmarks.results before.json after.json
+"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def git_revision() -> str:
+    """Коммит, на котором выполнен прогон, с пометкой о правках."""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{revision}-dirty' if dirty else revision
+
+
+def metadata() -> dict:
+    """Окружение прогона."""
+    meta = {
+        'commit': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    }
+    if 'django' in sys.modules:
+        import django
+        from django.conf import settings
+
+        if settings.configured:
+            from django.db import connection
+
+            meta['django'] = django.get_version()
+            meta['database'] = connection.vendor
+    return meta
+
+
+def write(path: str, benchmark: str, results: dict,
+          **extra_meta) -> None:
+    """Сохраняет результаты: {ключ замера: {метрика: значение}}."""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'benchmark': benchmark,
+            'meta': {**metadata(), **extra_meta},
+            'results': results,
+        }, file, indent=2, ensure_ascii=False)
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Печатает изменение числовых метрик между двумя прогонами."""
+    with open(before_path, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    for key, old_metrics in before['results'].items():
+        new_metrics = after['results'].get(key)
+        if new_metrics is None:
+            continue
+        print(key)
+        for metric, old in old_metrics.items():
+            new = new_metrics.get(metric)
+            if (isinstance(old, bool) or not isinstance(old, (int, float))
+                    or not isinstance(new, (int, float))):
+                continue
+            change = (new - old) / old * 100 if old else 0
+            print(f'  {metric:>14}: {old:>12} -> {new:>12}  ({change:+.1f}%)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    compare(sys.argv[1], sys.argv[2])
@@ -0,0 +1,168 @@
+"""
+Смешанная HTTP нагрузка на запущенный сервер: просмотр ленты, поиск
+ингредиентов, избранное и скачивание списка покупок.
+
+Сервер должен работать на базе, наполненной benchmarks.datagen,
+виртуальные пользователи входят под учётными записями bench_N.
+
+Запуск:
+    python -m benchmarks.scenario http://127.0.0.1:8000 \
+        --users 16 --duration 60 --json scenario.json
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+from benchmarks import results
+from benchmarks.loadtest import Worker, summarize
+
+# Совпадает с benchmarks.datagen.PASSWORD, сценарий не импортирует Django.
+PASSWORD = 'foodgram-benchmark'
+
+SEARCH_PREFIXES = ('мук', 'сах', 'сол', 'мол', 'яйц', 'мас', 'лук', 'пер')
+
+# Доли действий в нагрузке.
+WEIGHTS = {
+    'browse': 60,
+    'detail': 15,
+    'search': 15,
+    'favorite': 7,
+    'download': 3,
+}
+
+
+class VirtualUser:
+    """Пользователь, выполняющий случайные действия по весам WEIGHTS."""
+
+    page_size = 6
+
+    def __init__(self, base_url: str, number: int, recipe_ids: list,
+                 recipes_count: int, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.recipe_ids = recipe_ids
+        self.pages = max(1, recipes_count // self.page_size)
+        self.worker = Worker(base_url)
+        _, status, content = self.worker.request(
+            'POST', '/api/auth/token/login/',
+            {'email': f'bench_{number}@foodgram.test', 'password': PASSWORD}
+        )
+        if status != 200:
+            raise RuntimeError(f'Login failed for bench_{number}: {status}')
+        token = json.loads(content)['auth_token']
+        self.worker.headers['Authorization'] = f'Token {token}'
+
+    def browse(self) -> tuple:
+        page = self.rng.randint(1, min(self.pages, 20))
+        return self.worker.request(
+            'GET', f'/api/recipes/?page={page}&limit={self.page_size}'
+        )
+
+    def detail(self) -> tuple:
+        recipe_id = self.rng.choice(self.recipe_ids)
+        return self.worker.request('GET', f'/api/recipes/{recipe_id}/')
+
+    def search(self) -> tuple:
+        prefix = self.rng.choice(SEARCH_PREFIXES)
+        return self.worker.request(
+            'GET', f'/api/ingredients/?name={quote(prefix)}'
+        )
+
+    def favorite(self) -> tuple:
+        recipe_id = self.rng.choice(self.recipe_ids)
+        path = f'/api/recipes/{recipe_id}/favorite/'
+        elapsed, status, content = self.worker.request('POST', path)
+        if status == 400:
+            elapsed, status, content = self.worker.request('DELETE', path)
+        return elapsed, status, content
+
+    def download(self) -> tuple:
+        return self.worker.request(
+            'GET', '/api/recipes/download_shopping_cart/'
+        )
+
+
+def fetch_recipes(base_url: str, limit: int = 500) -> tuple[list, int]:
+    """Идентификаторы первых рецептов ленты и общее число рецептов."""
+    _, status, content = Worker(base_url).request(
+        'GET', f'/api/recipes/?limit={limit}'
+    )
+    if status != 200:
+        raise RuntimeError(f'Cannot list recipes: {status}')
+    page = json.loads(content)
+    return [recipe['id'] for recipe in page['results']], page['count']
+
+
+def run(base_url: str, users: int, duration: float, seed: int = 0) -> dict:
+    """Гоняет сценарий duration секунд, возвращает сводку по действиям."""
+    recipe_ids, recipes_count = fetch_recipes(base_url)
+    actions, weights = zip(*WEIGHTS.items())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def session(number: int) -> None:
+        user = VirtualUser(base_url, number, recipe_ids, recipes_count,
+                           seed + number)
+        while time.monotonic() < deadline:
+            action = user.rng.choices(actions, weights)[0]
+            elapsed, status, _ = getattr(user, action)()
+            with lock:
+                if 200 <= status < 400:
+                    latencies[action].append(elapsed)
+                else:
+                    errors[action] += 1
+
+    threads = [threading.Thread(target=session, args=(number,))
+               for number in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    for action in actions:
+        summary[action] = {
+            'requests': len(latencies[action]),
+            'errors': errors[action],
+            'rps': round(len(latencies[action]) / elapsed, 1),
+            **summarize(latencies[action]),
+        }
+    everything = [value for values in latencies.values() for value in values]
+    summary['total'] = {
+        'requests': len(everything),
+        'errors': sum(errors.values()),
+        'rps': round(len(everything) / elapsed, 1),
+        **summarize(everything),
+    }
+    return summary
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=16,
+                        help='virtual users, logged in as bench_0..N-1')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args(argv)
+
+    summary = run(args.url, args.users, args.duration, args.seed)
+    for action, values in summary.items():
+        print(f"{action:<9} n={values['requests']:<6} "
+              f"err={values['errors']:<4} rps={values['rps']:<7} "
+              f"p50={values['p50_ms']}ms p99={values['p99_ms']}ms")
+    if args.json_path:
+        results.write(args.json_path, 'scenario', summary,
+                      users=args.users, duration=args.duration)
+
+
+if __name__ == '__main__':
+    main()
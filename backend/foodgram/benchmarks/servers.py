@@ -0,0 +1,114 @@
+"""
+Сравнение режимов WSGI и ASGI на разных уровнях конкурентности.
+
+Оба сервера запускаются заранее на одной базе, например:
+    SERVER_MODE=wsgi GUNICORN_BIND=127.0.0.1:8001 gunicorn -c gunicorn.conf.py
+    SERVER_MODE=asgi GUNICORN_BIND=127.0.0.1:8002 gunicorn -c gunicorn.conf.py
+
+Запуск:
+    python -m benchmarks.servers --wsgi http://127.0.0.1:8001 \
+        --asgi http://127.0.0.1:8002 --levels 1,8,32,64 --slow-clients 8
+"""
+import argparse
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from benchmarks import results
+from benchmarks.loadtest import run
+
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%BC%D1%83%D0%BA',
+    '/api/recipes/',
+)
+
+
+@contextmanager
+def slow_clients(base_url: str, count: int, interval: float = 0.5):
+    """
+    Держит открытыми count соединений, медленно отправляющих тело
+    POST запроса, как мобильные клиенты на плохой сети при загрузке
+    изображения.
+    """
+    stop = threading.Event()
+    parts = urlsplit(base_url)
+
+    def trickle() -> None:
+        while not stop.is_set():
+            try:
+                sock = socket.create_connection(
+                    (parts.hostname, parts.port or 80), timeout=30
+                )
+            except OSError:
+                time.sleep(interval)
+                continue
+            with sock:
+                sock.sendall(
+                    b'POST /api/recipes/ HTTP/1.1\r\n'
+                    b'Host: ' + parts.hostname.encode() + b'\r\n'
+                    b'Content-Type: application/json\r\n'
+                    b'Content-Length: 1000000\r\n\r\n'
+                )
+                try:
+                    while not stop.wait(interval):
+                        sock.sendall(b' ' * 64)
+                except OSError:
+                    pass
+
+    threads = [threading.Thread(target=trickle, daemon=True)
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(interval * 2 if count else 0)
+        yield
+    finally:
+        stop.set()
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--wsgi', required=True, help='WSGI server base url')
+    parser.add_argument('--asgi', required=True, help='ASGI server base url')
+    parser.add_argument('--levels', default='1,8,32,64',
+                        help='comma separated concurrency levels')
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    parser.add_argument('--slow-clients', type=int, default=0,
+                        help='connections trickling a request body')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='path to load, may be repeated')
+    parser.add_argument('--json', dest='json_path')
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.levels.split(',')]
+    paths = args.paths or PATHS
+    summaries = []
+    for mode, base_url in (('wsgi', args.wsgi), ('asgi', args.asgi)):
+        with slow_clients(base_url, args.slow_clients):
+            for path in paths:
+                for level in levels:
+                    result = run(base_url.rstrip('/') + path, level,
+                                 args.requests, warmup=level)
+                    result['mode'] = mode
+                    summaries.append(result)
+
+    print(f"{'mode':<5} {'path':<32} {'c':>4} {'rps':>8} "
+          f"{'p50':>8} {'p99':>8} {'err':>5}")
+    for result in summaries:
+        path = urlsplit(result['url']).path
+        print(f"{result['mode']:<5} {path:<32} {result['concurrency']:>4} "
+              f"{result['rps']:>8} {result['p50_ms']:>8} "
+              f"{result['p99_ms']:>8} {result['errors']:>5}")
+    if args.json_path:
+        results.write(args.json_path, 'servers', {
+            f"{result['mode']} {result['url']} c={result['concurrency']}":
+                result
+            for result in summaries
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Поток событий /api/events/ обслуживается в цикле событий,
+# остальные запросы - Django.
+from api.event_stream import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections_health(**kwargs) -> None:
+    """
+    Закрывает постоянные соединения с БД, которые перестали отвечать.
+    Вызывается по сигналу request_started, чтобы запрос не упал
+    на соединении, разорванном сервером или пулером.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -27,20 +27,45 @@ INSTALLED_APPS = [
     'api',
     'recipes',
     'users',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+    'api.middleware.SessionMiddlewareForAdmin',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'api.middleware.CsrfViewMiddlewareForAdmin',
+    'api.middleware.AuthenticationMiddlewareForAdmin',
+    'api.middleware.MessageMiddlewareForAdmin',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
 
+# Запросы к API не проходят через сессии, CSRF, сообщения и
+# AuthenticationMiddleware, они нужны только админке.
+API_URL_PREFIX = '/api/'
+
+# Метрики запросов: заголовок Server-Timing и эндпоинт /metrics.
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED',
+                                    'False') == 'True'
+
+# Бюджет SQL запросов на вьюху, 0 - без ограничения.
+# REQUEST_QUERY_BUDGETS задаётся как 'api:recipes-list=10, api:tags-list=1'.
+REQUEST_QUERY_BUDGET_DEFAULT = int(os.getenv('REQUEST_QUERY_BUDGET_DEFAULT',
+                                             0))
+REQUEST_QUERY_BUDGETS = {
+    view.strip(): int(budget)
+    for view, _, budget in (
+        item.partition('=')
+        for item in os.getenv('REQUEST_QUERY_BUDGETS', '').split(',')
+        if item.strip()
+    )
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -59,6 +84,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Режим сервера: 'wsgi' (gunicorn) или 'asgi' (gunicorn + uvicorn).
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+# При работе по ASGI нагруженные эндпоинты на чтение
+# выполняются в отдельном пуле потоков.
+ASYNC_API_VIEWS = SERVER_MODE == 'asgi'
+ASYNC_API_VIEWS_THREADS = int(os.getenv('ASYNC_API_VIEWS_THREADS', 16))
+
+# Поток событий /api/events/ (только при работе по ASGI).
+# Брокер: api.events.MemoryBroker в памяти процесса для одного
+# воркера или api.events.PostgresBroker для нескольких процессов
+# и серверов (gunicorn предупреждает о MemoryBroker с несколькими
+# воркерами); EVENTS_PG_HOST и EVENTS_PG_PORT - адрес PostgreSQL
+# для LISTEN в обход pgbouncer.
+EVENTS_PATH = '/api/events/'
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'api.events.MemoryBroker')
+EVENTS_PG_HOST = os.getenv('EVENTS_PG_HOST', '')
+EVENTS_PG_PORT = os.getenv('EVENTS_PG_PORT', '')
+EVENTS_KEEPALIVE_SECONDS = int(os.getenv('EVENTS_KEEPALIVE_SECONDS', 15))
+EVENTS_STREAM_MAX_SECONDS = int(os.getenv('EVENTS_STREAM_MAX_SECONDS', 600))
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', 3000))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -66,10 +116,61 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            'keepalives': 1,
+            'keepalives_idle': int(os.getenv('DB_KEEPALIVES_IDLE', 60)),
+            'keepalives_interval': 10,
+            'keepalives_count': 3,
+        },
     }
 }
 
+# Проверка постоянных соединений с БД в начале каждого запроса.
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# Режим работы через пулер соединений: '' или 'pgbouncer'.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', '')
+
+if DB_POOL_MODE == 'pgbouncer':
+    # В transaction pooling серверные курсоры и prepared statements
+    # не переживают смену серверного соединения.
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Локальный запуск на SQLite: DB_ENGINE=sqlite, POSTGRES_DB - путь к файлу.
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('POSTGRES_DB') or BASE_DIR / 'db.sqlite3',
+    }
+
+# Реплики для чтения: адреса host[:port] через запятую,
+# для SQLite - пути к файлам.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if os.getenv('DB_ENGINE') == 'sqlite':
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+
+# Сколько секунд после изменения данных клиент читает только с primary.
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -99,21 +200,119 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
+# Имена с хэшем содержимого и .gz/.br копии для gzip_static nginx,
+# нужен collectstatic перед запуском с DEBUG=False.
+STATICFILES_STORAGE = 'foodgram.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Общий кэш для всех воркеров, например
+# django.core.cache.backends.memcached.PyMemcacheCache и cache:11211
+# (сервис cache в docker-compose). По умолчанию кэш в памяти процесса -
+# только для одного процесса: кэш токенов сбрасывается при выходе
+# лишь на том воркере, который его обработал.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostRateThrottle',
+    ],
+    # Адрес клиента для ограничения анонимов берётся из
+    # X-Forwarded-For, который выставляет nginx.
+    'NUM_PROXIES': int(os.getenv('API_NUM_PROXIES', 1)),
 }
 
+# Страница списков: размер без ?limit= и наибольший ?limit=.
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 6))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 100))
+
+# Ограничение частоты запросов (api.throttling): токенов в минуту
+# для пользователя и для IP анонима, 0 - без ограничения, и сколько
+# токенов можно потратить подряд за окно THROTTLE_BURST / rate минут.
+THROTTLE_USER_RATE = int(os.getenv('THROTTLE_USER_RATE', 240))
+THROTTLE_ANON_RATE = int(os.getenv('THROTTLE_ANON_RATE', 120))
+THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', 60))
+
+# Максимальный размер картинки рецепта, байты: и файла в multipart,
+# и картинки в base64 после декодирования.
+UPLOAD_IMAGE_MAX_SIZE = int(
+    os.getenv('UPLOAD_IMAGE_MAX_SIZE', 10 * 2 ** 20)
+)
+
+# Сколько рецептов можно запросить за раз через /api/recipes/batch/.
+RECIPES_BATCH_MAX_IDS = int(os.getenv('RECIPES_BATCH_MAX_IDS', 100))
+
+# /api/recipes/changes/: рецептов на странице и сколько секунд
+# последних изменений не отдавать, пока идут транзакции с ними.
+RECIPES_CHANGES_PAGE_SIZE = int(os.getenv('RECIPES_CHANGES_PAGE_SIZE', 100))
+RECIPES_CHANGES_LAG = int(os.getenv('RECIPES_CHANGES_LAG', 5))
+# Сколько дней хранятся записи об удалённых рецептах
+# (prune_deleted_recipes); клиенту, не синхронизировавшемуся дольше,
+# нужна полная загрузка.
+RECIPES_DELETED_RETENTION_DAYS = int(
+    os.getenv('RECIPES_DELETED_RETENTION_DAYS', 30)
+)
+
+# Время жизни кэша токенов, секунды.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 30))
+
+# Сколько секунд nginx и другие общие кэши могут хранить ответы
+# анонимам для списков и страниц тегов, ингредиентов и рецептов.
+# 0 - не кэшировать.
+API_ANONYMOUS_CACHE_SECONDS = int(
+    os.getenv('API_ANONYMOUS_CACHE_SECONDS', 10)
+)
+
+# Время жизни готового списка покупок в кэше, секунды. Ключ - версия
+# корзины из базы (ShoppingCartVersion), устаревший список не отдаётся.
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', 3600)
+)
+
+# Сколько похожих рецептов хранится для каждого рецепта.
+SIMILAR_RECIPES_COUNT = int(os.getenv('SIMILAR_RECIPES_COUNT', 10))
+
+# Популярные рецепты (compute_trending): сколько хранить, за сколько
+# часов учитываются добавления и за сколько часов их вес падает вдвое.
+TRENDING_RECIPES_COUNT = int(os.getenv('TRENDING_RECIPES_COUNT', 500))
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', 168))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+
+# Как часто процесс записывает накопленные просмотры рецептов, секунды.
+RECIPE_VIEWS_FLUSH_SECONDS = float(
+    os.getenv('RECIPE_VIEWS_FLUSH_SECONDS', 10)
+)
+
+# Фоновые задачи: python manage.py run_workers.
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+# Задержка перед повтором, секунды: удваивается с каждой попыткой.
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', 10))
+JOBS_RETRY_MAX_DELAY = int(os.getenv('JOBS_RETRY_MAX_DELAY', 600))
+# Как часто воркер отмечает, что задача ещё выполняется, секунды.
+JOBS_HEARTBEAT = float(os.getenv('JOBS_HEARTBEAT', 30))
+# Задача в статусе running без отметки воркера дольше этого срока
+# считается брошенной упавшим воркером.
+JOBS_TIMEOUT = int(os.getenv('JOBS_TIMEOUT', 600))
+# Сколько дней хранятся выполненные и упавшие задачи (prune_jobs).
+JOBS_RETENTION_DAYS = int(os.getenv('JOBS_RETENTION_DAYS', 7))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
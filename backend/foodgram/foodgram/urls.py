@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('api/', include('api.urls', namespace='api')),
     path('admin/', admin.site.urls),
 ]
+
+if settings.REQUEST_METRICS_ENABLED:
+    urlpatterns.append(path('metrics', metrics_view, name='metrics'))
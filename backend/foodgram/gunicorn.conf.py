@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.getenv('GUNICORN_WORKERS',
+                        multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Периодический перезапуск воркеров ограничивает рост памяти.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+
+# Метрики /metrics суммируются по воркерам через файлы каталога,
+# воркеры наследуют переменную от мастера.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+
+def on_starting(server) -> None:
+    """Значения прошлого запуска не попадают в метрики."""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker) -> None:
+    """Значения завершённого воркера остаются в сумме."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server) -> None:
+    """Предупреждает о настройках, рассчитанных на один процесс."""
+    if workers < 2:
+        return
+    if 'locmem' in os.getenv('CACHE_BACKEND', 'locmem'):
+        server.log.warning(
+            'CACHE_BACKEND is per-process with %d workers: revoked tokens '
+            'stay valid on other workers for AUTH_TOKEN_CACHE_TIMEOUT, '
+            'throttle limits are multiplied by the worker count. '
+            'Use a shared cache (memcached).', workers
+        )
+    if (os.getenv('SERVER_MODE', 'wsgi') == 'asgi'
+            and os.getenv('EVENTS_BROKER', 'api.events.MemoryBroker')
+            == 'api.events.MemoryBroker'):
+        server.log.warning(
+            'EVENTS_BROKER is MemoryBroker with %d workers: /api/events/ '
+            'streams only get events published by their own worker. '
+            'Use api.events.PostgresBroker.', workers
+        )
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Админка для фоновых задач."""
+    list_display = ('id', 'name', 'user', 'status', 'attempts', 'run_at',
+                    'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'created_at', 'started_at',
+                       'heartbeat_at', 'finished_at', 'worker', 'error')
+    empty_value_display = '-пусто-'
@@ -0,0 +1,55 @@
+from io import StringIO
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from api.services import get_shopping_list
+from jobs.models import Job
+from jobs.registry import job_handler
+from recipes.similarity import refresh_similar
+from recipes.trending import compute_trending
+
+
+@job_handler('shopping_list')
+def shopping_list(job: Job) -> dict:
+    """Список покупок пользователя в txt файле."""
+    filename = f'{job.user.username}_shopping_list.txt'
+    job.file.save(filename, ContentFile(get_shopping_list(job.user)),
+                  save=False)
+    return {'filename': filename}
+
+
+def run_import(command: str, job: Job) -> dict:
+    output = StringIO()
+    options = {key: job.payload[key]
+               for key in ('path', 'delete', 'dry_run', 'batch_size')
+               if key in job.payload}
+    if 'path' in options:
+        options['path'] = Path(options['path'])
+    call_command(command, stdout=output, **options)
+    return {'output': output.getvalue()}
+
+
+@job_handler('import_ingredients', staff_only=True)
+def import_ingredients(job: Job) -> dict:
+    """Импорт ингредиентов, параметры как у команды import_ingredients."""
+    return run_import('import_ingredients', job)
+
+
+@job_handler('import_tags', staff_only=True)
+def import_tags(job: Job) -> dict:
+    """Импорт тегов, параметры как у команды import_tags."""
+    return run_import('import_tags', job)
+
+
+@job_handler('similar_recipes', staff_only=True)
+def similar_recipes(job: Job) -> dict:
+    """Пересчёт похожих для изменённых рецептов, payload: {'recipes': [id]}."""
+    return {'pairs': refresh_similar(job.payload['recipes'])}
+
+
+@job_handler('trending', staff_only=True)
+def trending(job: Job) -> dict:
+    """Пересчёт популярных рецептов, как команда compute_trending."""
+    return {'recipes': compute_trending(job.payload.get('count'))}
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from jobs.models import Job
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Удаление выполненных и упавших задач старше JOBS_RETENTION_DAYS
+    вместе с файлами результатов.
+    Запускается по расписанию, например раз в сутки.
+    Запуск команды: python manage.py prune_jobs [--days N]
+    """
+    help = 'Delete finished jobs and their result files'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--days', type=int,
+                            default=settings.JOBS_RETENTION_DAYS,
+                            help='days to keep finished jobs')
+
+    def handle(self, *args, **options) -> None:
+        before = timezone.now() - timedelta(days=options['days'])
+        finished = Job.objects.filter(
+            status__in=(Job.Status.DONE, Job.Status.FAILED),
+            finished_at__lt=before,
+        )
+        deleted = 0
+        while True:
+            batch = list(finished.order_by('id')
+                         .values_list('id', 'file')[:BATCH_SIZE])
+            if not batch:
+                break
+            Job.objects.filter(id__in=[pk for pk, _ in batch]).delete()
+            # Файлы удаляются после строк: ни одна задача
+            # не ссылается на удалённый файл.
+            for _, name in batch:
+                if name:
+                    default_storage.delete(name)
+            deleted += len(batch)
+        self.stdout.write(f'Удалено задач: {deleted}')
@@ -0,0 +1,62 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connections
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    """
+    Запуск воркеров фоновых задач.
+    Каждый воркер - отдельный процесс, задачи распределяются между
+    ними через SELECT ... FOR UPDATE SKIP LOCKED.
+    SIGTERM и Ctrl+C дают воркерам доделать текущую задачу.
+    Запуск команды: python manage.py run_workers [--workers N] [--once]
+    """
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOBS_WORKERS)
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL,
+                            help='seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='exit when the queue is empty')
+
+    def handle(self, *args, **options) -> None:
+        stop = multiprocessing.Event()
+
+        def shutdown(signum, frame) -> None:
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        work_options = {'stop': stop,
+                        'poll_interval': options['poll_interval'],
+                        'once': options['once']}
+
+        if options['workers'] == 1:
+            done = work(**work_options)
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+
+        # Соединения с базой не переживают fork, каждый процесс
+        # открывает своё.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, kwargs=work_options,
+                                    name=f'jobs-worker-{number}')
+            for number in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'Запущено воркеров: {len(processes)}'
+        ))
+        for process in processes:
+            process.join()
+        self.stdout.write('Воркеры остановлены')
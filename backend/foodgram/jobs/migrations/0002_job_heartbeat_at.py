@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-19 08:58
+
+from django.db import migrations, models
+
+
+def fill_heartbeat(apps, schema_editor):
+    """Выполняющиеся задачи считаются живыми с момента запуска."""
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.filter(status='running').update(
+        heartbeat_at=models.F('started_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний сигнал воркера'),
+        ),
+        migrations.RunPython(fill_heartbeat, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+User = get_user_model()
+
+
+def job_file_path(job: 'Job', filename: str) -> str:
+    """Случайный каталог, чтобы файл нельзя было найти по имени."""
+    return f'jobs/{uuid.uuid4().hex}/{filename}'
+
+
+def default_max_attempts() -> int:
+    return settings.JOBS_MAX_ATTEMPTS
+
+
+class Job(models.Model):
+    """
+    Модель фоновой задачи.
+    Задачи выбираются воркерами run_workers через
+    SELECT ... FOR UPDATE SKIP LOCKED, упавшие повторяются
+    с растущей задержкой до max_attempts попыток.
+    Пока задача выполняется, воркер обновляет heartbeat_at.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(
+        verbose_name='Обработчик',
+        max_length=100,
+    )
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    payload = models.JSONField(
+        verbose_name='Параметры',
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    result = models.JSONField(
+        verbose_name='Результат',
+        null=True,
+        blank=True,
+    )
+    file = models.FileField(
+        verbose_name='Файл результата',
+        upload_to=job_file_path,
+        blank=True,
+    )
+    error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=default_max_attempts,
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запустить не раньше',
+        default=timezone.now,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True,
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Начата',
+        null=True,
+        blank=True,
+    )
+    heartbeat_at = models.DateTimeField(
+        verbose_name='Последний сигнал воркера',
+        null=True,
+        blank=True,
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True,
+    )
+    worker = models.CharField(
+        verbose_name='Воркер',
+        max_length=100,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}: {self.get_status_display()}'
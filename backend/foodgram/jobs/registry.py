@@ -0,0 +1,69 @@
+from typing import Callable, NamedTuple
+
+from django.db import transaction
+
+from jobs.models import Job, User
+
+
+class Handler(NamedTuple):
+    """Обработчик задачи, staff_only - ставить через API может только админ."""
+    func: Callable[[Job], dict | None]
+    staff_only: bool = False
+
+
+HANDLERS: dict[str, Handler] = {}
+
+
+def job_handler(name: str, staff_only: bool = False):
+    """
+    Регистрирует обработчик задачи name.
+    Обработчик получает Job и возвращает результат для Job.result.
+    """
+    def decorator(func):
+        HANDLERS[name] = Handler(func, staff_only)
+        return func
+    return decorator
+
+
+def enqueue(name: str, payload: dict | None = None,
+            user: User | None = None, **kwargs) -> Job:
+    """
+    Ставит задачу в очередь.
+    Воркеры увидят её после фиксации текущей транзакции.
+    """
+    if name not in HANDLERS:
+        raise KeyError(f'Unknown job handler: {name}')
+    return Job.objects.create(name=name, payload=payload or {}, user=user,
+                              **kwargs)
+
+
+def enqueue_batched(name: str, key: str, values: list,
+                    limit: int = 100) -> Job:
+    """
+    Добавляет values в список payload[key] задачи name, ещё не взятой
+    воркером, или ставит новую, если такой нет или в её списке уже
+    limit значений. Частые изменения дают одну задачу на пачку,
+    а не задачу на каждое изменение.
+    Задачи, заблокированные другой транзакцией, пропускаются
+    (SKIP LOCKED): параллельные сохранения не ждут друг друга.
+    """
+    with transaction.atomic(savepoint=False):
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(name=name, status=Job.Status.QUEUED, attempts=0)
+            .order_by('id')
+            .first()
+        )
+        if job is not None:
+            merged = list(job.payload.get(key, []))
+            merged.extend(value for value in values if value not in merged)
+            if len(merged) <= limit:
+                # На SQLite блокировок строк нет: список меняется, только
+                # если воркер ещё не забрал задачу.
+                updated = Job.objects.filter(
+                    pk=job.pk, status=Job.Status.QUEUED, attempts=0
+                ).update(payload={**job.payload, key: merged})
+                if updated:
+                    job.payload = {**job.payload, key: merged}
+                    return job
+        return enqueue(name, {key: list(values)})
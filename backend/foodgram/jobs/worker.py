@@ -0,0 +1,171 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (DatabaseError, close_old_connections, connection,
+                       transaction)
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import HANDLERS
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная задержка перед повтором со случайной добавкой."""
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+                settings.JOBS_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def claim(worker: str) -> Job | None:
+    """
+    Забирает следующую задачу из очереди.
+    Строки, заблокированные другими воркерами, пропускаются
+    (SKIP LOCKED), поэтому воркеры не ждут друг друга.
+    Задачи в running, у которых воркер не обновлял heartbeat_at
+    дольше JOBS_TIMEOUT, считаются брошенными упавшим воркером
+    и выполняются заново, а исчерпавшие max_attempts - упавшими:
+    задача, которая роняет воркер, не повторяется бесконечно.
+    """
+    while True:
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.JOBS_TIMEOUT)
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(Q(status=Job.Status.QUEUED, run_at__lte=now)
+                        | Q(status=Job.Status.RUNNING,
+                            heartbeat_at__lt=stale))
+                .order_by('run_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            # На SQLite блокировок строк нет, условное обновление
+            # не даёт двум воркерам забрать одну задачу.
+            current = Job.objects.filter(pk=job.pk, status=job.status,
+                                         attempts=job.attempts)
+            if (job.status == Job.Status.RUNNING
+                    and job.attempts >= job.max_attempts):
+                if current.update(
+                    status=Job.Status.FAILED, finished_at=now,
+                    error=f'Worker {job.worker} stopped responding '
+                          f'on the last attempt.',
+                ):
+                    logger.error('Job %s abandoned by worker %s, attempt '
+                                 '%d of %d', job, job.worker, job.attempts,
+                                 job.max_attempts)
+                continue
+            claimed = current.update(
+                status=Job.Status.RUNNING, attempts=job.attempts + 1,
+                started_at=now, heartbeat_at=now, worker=worker,
+            )
+        if not claimed:
+            return None
+        job.refresh_from_db()
+        return job
+
+
+def owned(job: Job) -> QuerySet:
+    """Задача, пока её не забрал заново другой воркер."""
+    return Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING,
+                              attempts=job.attempts, worker=job.worker)
+
+
+def keep_alive(job: Job, stop: threading.Event) -> None:
+    """
+    Раз в JOBS_HEARTBEAT секунд отмечает, что задача выполняется:
+    долгую задачу другие воркеры не считают брошенной.
+    """
+    try:
+        while not stop.wait(settings.JOBS_HEARTBEAT):
+            try:
+                owned(job).update(heartbeat_at=timezone.now())
+            except DatabaseError:
+                logger.exception('Failed to renew job %s', job)
+    finally:
+        connection.close()
+
+
+def run_job(job: Job) -> None:
+    """
+    Выполняет задачу и сохраняет результат или планирует повтор.
+    Если за время выполнения задачу забрал другой воркер (отметки
+    не доходили до базы дольше JOBS_TIMEOUT), результат не сохраняется.
+    """
+    handler = HANDLERS.get(job.name)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=keep_alive, args=(job, stop),
+                                 name=f'job-{job.pk}-heartbeat', daemon=True)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise LookupError(f'Unknown job handler: {job.name}')
+        result = handler.func(job)
+    except Exception:
+        logger.exception('Job %s failed, attempt %d of %d',
+                         job, job.attempts, job.max_attempts)
+        job.error = traceback.format_exc()
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = Job.Status.QUEUED
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.Status.DONE
+        job.result = result
+        job.finished_at = timezone.now()
+    finally:
+        stop.set()
+        heartbeat.join()
+    with transaction.atomic():
+        if not owned(job).select_for_update().exists():
+            logger.warning('Job %s was reclaimed by another worker, '
+                           'result is discarded', job)
+            return
+        job.heartbeat_at = timezone.now()
+        job.save()
+
+
+def work(stop: threading.Event | None = None, poll_interval: float = 1.0,
+         once: bool = False) -> int:
+    """
+    Цикл воркера: выполняет задачи, пока не установлен stop.
+    С once=True выходит, когда очередь пуста.
+    Возвращает число выполненных задач.
+    """
+    stop = stop or threading.Event()
+    worker = worker_name()
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            job = claim(worker)
+            if job is not None:
+                run_job(job)
+                done += 1
+        except DatabaseError:
+            # База недоступна или занята: ждём и пробуем снова, задача,
+            # не сохранённая после выполнения, вернётся по JOBS_TIMEOUT.
+            logger.exception('Job queue database error')
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            if once:
+                break
+            stop.wait(poll_interval)
+    close_old_connections()
+    return done
@@ -3,7 +3,7 @@ from django.contrib import admin
 from django.contrib.admin import display, site
 
 from recipes.models import (Favorites, Ingredient, IngredientAmountInRecipe,
-                            Recipe, ShoppingCart, Tag)
+                            Recipe, ShoppingCart, Tag, touch_recipes)
 
 site.site_header = "Администрирование Foodgram"
 EMPTY_VALUE_DISPLAY = '-пусто-'
@@ -46,13 +46,28 @@ class IngredientAmountInRecipeAdmin(admin.ModelAdmin):
     list_filter = ('recipe',)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
+    # Строки правятся без сохранения рецепта, поэтому рецепт
+    # отмечается изменённым здесь.
+    def save_model(self, request, obj, form, change) -> None:
+        super().save_model(request, obj, form, change)
+        touch_recipes(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_model(self, request, obj) -> None:
+        super().delete_model(request, obj)
+        touch_recipes(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_queryset(self, request, queryset) -> None:
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Админка для рецептов."""
     list_display = ('name', 'author', 'in_favorites')
     list_filter = ('name', 'author', 'tags')
-    readonly_fields = ('in_favorites',)
+    readonly_fields = ('in_favorites', 'views')
     inlines = (IngredientAmountInline,)
     empty_value_display = EMPTY_VALUE_DISPLAY
 
@@ -0,0 +1,152 @@
+import csv
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Model
+
+from recipes.models import Recipe, touch_recipes
+
+
+class CSVSyncCommand(BaseCommand):
+    """
+    Синхронизация справочника с csv файлом.
+    Строки сравниваются с таблицей по key_fields: новые добавляются,
+    у найденных обновляются update_fields, совпадающие не трогаются.
+    Отсутствующие в файле записи удаляются только с --delete,
+    записи, на которые ссылаются рецепты (in_use_lookup), не удаляются.
+    bulk_update не отправляет post_save, поэтому рецепты с обновлёнными
+    записями (recipes_lookup) отмечаются изменёнными здесь.
+    """
+    model: type[Model]
+    file_name: str
+    key_fields: tuple
+    update_fields: tuple = ()
+    in_use_lookup: str
+    recipes_lookup: str
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--path', type=Path,
+            default=settings.BASE_DIR / 'data' / self.file_name,
+            help='CSV file to import',
+        )
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='delete rows that are missing from the file',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='report the changes without writing them',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def read_rows(self, path: Path):
+        """Построчно читает файл, не загружая его целиком."""
+        fields = self.key_fields + self.update_fields
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file)
+            missing = set(fields) - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(
+                    f'{path}: нет колонок {", ".join(sorted(missing))}'
+                )
+            for row in reader:
+                yield {field: row[field].strip() for field in fields}
+
+    def build(self, row: dict) -> Model:
+        """Объект для вставки или обновления по строке файла."""
+        return self.model(**row)
+
+    def handle(self, *args, **options) -> None:
+        path = options['path']
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        name = self.model._meta.verbose_name_plural
+
+        # Ключ -> (значения update_fields..., pk).
+        size = len(self.key_fields)
+        existing = {
+            values[:size]: values[size:]
+            for values in self.model.objects.values_list(
+                *self.key_fields, *self.update_fields, 'pk'
+            )
+        }
+        seen = set()
+        created = updated = unchanged = 0
+
+        rows = self.read_rows(path)
+        with transaction.atomic():
+            while chunk := list(islice(rows, batch_size)):
+                to_create, to_update = [], []
+                for row in chunk:
+                    key = tuple(row[field] for field in self.key_fields)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    values = tuple(row[field] for field in self.update_fields)
+                    if key not in existing:
+                        to_create.append(self.build(row))
+                    elif existing[key][:-1] != values:
+                        obj = self.build(row)
+                        obj.pk = existing[key][-1]
+                        to_update.append(obj)
+                    else:
+                        unchanged += 1
+                created += len(to_create)
+                updated += len(to_update)
+                if dry_run:
+                    continue
+                # update_conflicts появился в Django 4.1, поэтому
+                # обновления идут через bulk_update, а ignore_conflicts
+                # защищает от параллельной вставки тех же ключей.
+                self.model.objects.bulk_create(to_create,
+                                               ignore_conflicts=True)
+                if to_update:
+                    self.model.objects.bulk_update(to_update,
+                                                   self.update_fields)
+                    touch_recipes(Recipe.objects.filter(**{
+                        f'{self.recipes_lookup}__in': to_update
+                    }))
+
+            stale = [values[-1] for key, values in existing.items()
+                     if key not in seen]
+            in_use, deleted = [], 0
+            if stale:
+                in_use = list(
+                    self.model.objects.filter(pk__in=stale)
+                    .filter(**{f'{self.in_use_lookup}__isnull': False})
+                    .distinct()
+                )
+            if stale and options['delete']:
+                to_delete = self.model.objects.filter(pk__in=stale).exclude(
+                    pk__in=[obj.pk for obj in in_use]
+                )
+                if options['verbosity'] > 1:
+                    for obj in to_delete:
+                        self.stdout.write(f'  - {obj}')
+                deleted = to_delete.count()
+                if not dry_run:
+                    to_delete.delete()
+
+        if not options['verbosity']:
+            return
+        prefix = 'Пробный запуск, изменения не сохранены. ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{name}: добавлено {created}, обновлено {updated}, '
+            f'без изменений {unchanged}, удалено {deleted}'
+        ))
+        if stale and not options['delete']:
+            self.stdout.write(
+                f'Нет в файле: {len(stale)}, для удаления запустите '
+                'с --delete'
+            )
+        elif in_use:
+            self.stdout.write(self.style.WARNING(
+                'Используются в рецептах и не удаляются: '
+                + ', '.join(str(obj) for obj in in_use)
+            ))
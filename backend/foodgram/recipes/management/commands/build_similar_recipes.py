@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.similarity import rebuild_similar, refresh_similar
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт похожих рецептов (recipes.similarity).
+    Без параметров пересчитывает все рецепты через MinHash/LSH,
+    с --recipes - точно пересчитывает соседей указанных рецептов.
+    Запуск команды: python manage.py build_similar_recipes
+    [--recipes ID [ID ...]] [--count N]
+    """
+    help = 'Rebuild the similar recipes table'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--recipes', type=int, nargs='+',
+                            help='refresh only these recipes')
+        parser.add_argument('--count', type=int,
+                            default=settings.SIMILAR_RECIPES_COUNT,
+                            help='neighbours to keep per recipe')
+
+    def handle(self, *args, **options) -> None:
+        started = time.monotonic()
+        if options['recipes']:
+            pairs = refresh_similar(options['recipes'], options['count'])
+        else:
+            pairs = rebuild_similar(options['count'])
+        self.stdout.write(
+            f'Записано пар: {pairs} за {time.monotonic() - started:.1f} с'
+        )
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.trending import compute_trending
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт популярных рецептов (recipes.trending) для ленты
+    с ?ordering=trending. Запускается по расписанию, например раз в час.
+    Запуск команды: python manage.py compute_trending [--count N]
+    """
+    help = 'Recompute trending recipes'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--count', type=int,
+                            default=settings.TRENDING_RECIPES_COUNT,
+                            help='recipes to keep')
+
+    def handle(self, *args, **options) -> None:
+        recipes = compute_trending(options['count'])
+        self.stdout.write(f'Популярных рецептов: {recipes}')
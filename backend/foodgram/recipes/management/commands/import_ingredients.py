@@ -1,30 +1,25 @@
-import csv
-
-from django.core.management import BaseCommand
-
+from recipes.management.base import CSVSyncCommand
 from recipes.models import Ingredient
 
 
-class Command(BaseCommand):
+class Command(CSVSyncCommand):
     """
     Импорт ингредиентов из csv файла ingredients.csv
-    Замещает все ранее созданные ингредиенты.
-    Запуск команды: python manage.py import_ingredients
+    Добавляет новые ингредиенты, повторный запуск с тем же файлом
+    ничего не меняет. Ингредиенты, которых нет в файле, удаляются
+    только с --delete и только если не используются в рецептах.
+    Запуск команды: python manage.py import_ingredients [--path FILE]
+    [--delete] [--dry-run]
     """
     help = 'Import ingredients from ingredients.csv file'
+    model = Ingredient
+    file_name = 'ingredients.csv'
+    key_fields = ('name', 'measurement_unit')
+    in_use_lookup = 'ingredientamountinrecipe'
+    recipes_lookup = 'ingredients__ingredient'
 
-    def handle(self, *args, **options) -> None:
-        self.stdout.write(self.style.WARNING('Загрузка ингредиентов'))
-        Ingredient.objects.all().delete()
-        csv_file_path = 'data/ingredients.csv'
-        ingredients = []
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                new_ingredient = Ingredient()
-                new_ingredient.name = row['name']
-                new_ingredient.measurement_unit = row['measurement_unit']
-                ingredients.append(new_ingredient)
-        Ingredient.objects.bulk_create(ingredients)
-
-        self.stdout.write(self.style.SUCCESS('Ингредиенты загружены'))
+    def build(self, row: dict) -> Ingredient:
+        ingredient = super().build(row)
+        # bulk_create не вызывает save(), единицы заполняются здесь.
+        ingredient.set_canonical_unit()
+        return ingredient
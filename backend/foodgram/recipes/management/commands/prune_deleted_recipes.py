@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.models import DeletedRecipe
+
+
+class Command(BaseCommand):
+    """
+    Удаление записей об удалённых рецептах старше
+    RECIPES_DELETED_RETENTION_DAYS: /api/recipes/changes/ с более
+    старым updated_since их уже не отдаёт.
+    Запускается по расписанию, например раз в сутки.
+    Запуск команды: python manage.py prune_deleted_recipes [--days N]
+    """
+    help = 'Delete old deleted recipe records'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--days', type=int,
+                            default=settings.RECIPES_DELETED_RETENTION_DAYS,
+                            help='days to keep the records')
+
+    def handle(self, *args, **options) -> None:
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = DeletedRecipe.objects.filter(
+            deleted_at__lt=before
+        ).delete()
+        self.stdout.write(f'Удалено записей: {deleted}')
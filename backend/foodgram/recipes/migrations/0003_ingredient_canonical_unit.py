@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-19 07:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Копия recipes.units.UNIT_CONVERSIONS на момент миграции: правки
+# таблицы не должны менять результат уже написанной миграции.
+UNIT_CONVERSIONS = {
+    'г': ('г', Decimal(1)),
+    'кг': ('г', Decimal(1000)),
+    'мл': ('мл', Decimal(1)),
+    'л': ('мл', Decimal(1000)),
+    'ч. л.': ('мл', Decimal(5)),
+    'ст. л.': ('мл', Decimal(15)),
+    'стакан': ('мл', Decimal(250)),
+    'капля': ('мл', Decimal('0.05')),
+    'шт.': ('шт.', Decimal(1)),
+    'пакет': ('пакетик', Decimal(1)),
+    'пакетик': ('пакетик', Decimal(1)),
+    'пачка': ('упаковка', Decimal(1)),
+    'упаковка': ('упаковка', Decimal(1)),
+}
+
+
+def fill_canonical_units(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ingredients = list(Ingredient.objects.all())
+    for ingredient in ingredients:
+        ingredient.canonical_unit, ingredient.unit_factor = (
+            UNIT_CONVERSIONS.get(ingredient.measurement_unit,
+                                 (ingredient.measurement_unit, Decimal(1)))
+        )
+    Ingredient.objects.bulk_update(
+        ingredients, ('canonical_unit', 'unit_factor'), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical_unit',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Единица для списка покупок'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='unit_factor',
+            field=models.DecimalField(decimal_places=4, default=1, editable=False, max_digits=12, verbose_name='Множитель перевода в единицу для списка покупок'),
+        ),
+        migrations.RunPython(fill_canonical_units, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-19 07:55
+
+from django.db import migrations, models
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_canonical_unit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, upload_to=recipes.models.recipe_image_path, verbose_name='Изображение'),
+        ),
+    ]
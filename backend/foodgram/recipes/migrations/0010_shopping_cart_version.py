@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-19 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_composite_indexes'),
+        ('recipes', '0009_recipe_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shopping_cart_version', serialize=False, to='users.user', verbose_name='Пользователь')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия списка покупок',
+                'verbose_name_plural': 'Версии списков покупок',
+            },
+        ),
+    ]
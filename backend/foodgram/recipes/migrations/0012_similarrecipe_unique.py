@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+def delete_duplicates(apps, schema_editor):
+    """Из повторов пары (recipe, similar) остаётся первая запись."""
+    SimilarRecipe = apps.get_model('recipes', 'SimilarRecipe')
+    duplicates = (
+        SimilarRecipe.objects.order_by().values('recipe', 'similar')
+        .annotate(keep=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        SimilarRecipe.objects.filter(
+            recipe=duplicate['recipe'], similar=duplicate['similar']
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipeband'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='similarrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'similar'), name='unique_similar_recipe'),
+        ),
+    ]
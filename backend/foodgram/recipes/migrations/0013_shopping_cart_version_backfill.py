@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-19 19:20
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def create_versions(apps, schema_editor):
+    """
+    Версия нужна каждому, у кого что-то лежит в корзине: удаление
+    из корзины только меняет существующую версию.
+    """
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartVersion = apps.get_model('recipes', 'ShoppingCartVersion')
+    now = timezone.now()
+    user_ids = ShoppingCart.objects.order_by().values_list(
+        'user_id', flat=True
+    ).distinct()
+    ShoppingCartVersion.objects.bulk_create(
+        (ShoppingCartVersion(user_id=user_id, updated_at=now)
+         for user_id in user_ids.iterator()),
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_similarrecipe_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,31 @@
+import hashlib
+import os
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from recipes.units import to_canonical
 
 User = get_user_model()
 
 
+def recipe_image_path(recipe: 'Recipe', filename: str) -> str:
+    """
+    Имя картинки рецепта по хэшу содержимого.
+    По одному адресу всегда лежит один и тот же файл, поэтому nginx
+    отдаёт такие имена с Cache-Control: immutable.
+    """
+    digest = hashlib.sha256()
+    for chunk in recipe.image.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(filename)[1].lower()
+    return f'recipes/images/{digest.hexdigest()[:32]}{extension}'
+
+
 class Tag(models.Model):
     """Модель для тегов."""
     name = models.CharField(
@@ -50,6 +70,19 @@ class Ingredient(models.Model):
         verbose_name='Единица измерения',
         max_length=settings.DESCRIPTION_MAX_LENGTH,
     )
+    canonical_unit = models.CharField(
+        verbose_name='Единица для списка покупок',
+        max_length=settings.DESCRIPTION_MAX_LENGTH,
+        default='',
+        editable=False,
+    )
+    unit_factor = models.DecimalField(
+        verbose_name='Множитель перевода в единицу для списка покупок',
+        max_digits=12,
+        decimal_places=4,
+        default=1,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -65,6 +98,16 @@ class Ingredient(models.Model):
     def __str__(self) -> str:
         return f'{self.name}'
 
+    def set_canonical_unit(self) -> None:
+        """Заполняет каноническую единицу по recipes.units."""
+        self.canonical_unit, self.unit_factor = to_canonical(
+            self.measurement_unit
+        )
+
+    def save(self, *args, **kwargs) -> None:
+        self.set_canonical_unit()
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
     """Модель для рецептов."""
@@ -77,6 +120,8 @@ class Recipe(models.Model):
         verbose_name='Автор',
         on_delete=models.SET_NULL,
         null=True,
+        # Заменён индексом recipe_author_pub_date_idx.
+        db_index=False,
     )
     text = models.TextField(
         verbose_name='Описание',
@@ -87,7 +132,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name='Изображение',
-        upload_to='recipes/images/',
+        upload_to=recipe_image_path,
         default=None
     )
     tags = models.ManyToManyField(
@@ -99,6 +144,16 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    # Пишется пачками из api.counters, а не через save(): просмотр
+    # не меняет ни updated_at, ни рецепт для синхронизации клиентов.
+    views = models.PositiveIntegerField(
+        verbose_name='Просмотры',
+        default=0,
+    )
 
     class Meta:
         default_related_name = 'recipes'
@@ -111,11 +166,55 @@ class Recipe(models.Model):
                 name='unique_recipe_author'
             ),
         ]
+        indexes = [
+            # Лента и рецепты автора отдаются по индексу без сортировки.
+            models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            # Ключ постраничной выдачи /api/recipes/changes/.
+            models.Index(fields=['updated_at', 'id'],
+                         name='recipe_updated_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.name}'
 
 
+def touch_recipes(recipes: QuerySet) -> int:
+    """
+    Отмечает рецепты изменёнными.
+    Для правок, которые не сохраняют сам рецепт: update() не
+    заполняет auto_now поля.
+    """
+    return recipes.update(updated_at=timezone.now())
+
+
+class DeletedRecipe(models.Model):
+    """
+    Запись об удалённом рецепте.
+    По ним /api/recipes/changes/ сообщает клиентам, какие рецепты
+    удалить у себя.
+    """
+    recipe_id = models.PositiveBigIntegerField(
+        verbose_name='id рецепта',
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name='Дата удаления',
+        default=timezone.now,
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+        indexes = [
+            models.Index(fields=['deleted_at', 'recipe_id'],
+                         name='deleted_recipe_deleted_at_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.deleted_at}'
+
+
 class IngredientAmountInRecipe(models.Model):
     """
     Модель связи ингредиентов с рецептами, с указанием количества ингредиентов.
@@ -130,6 +229,8 @@ class IngredientAmountInRecipe(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
         related_name='ingredients',
+        # Заменён индексом ingredient_amount_recipe_idx.
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество',
@@ -140,6 +241,12 @@ class IngredientAmountInRecipe(models.Model):
     class Meta:
         verbose_name = 'Количество ингредиентов'
         verbose_name_plural = 'Количество ингредиентов'
+        indexes = [
+            # Покрывающий индекс для prefetch ингредиентов и списка
+            # покупок, include поддерживается только PostgreSQL.
+            models.Index(fields=['recipe', 'ingredient'], include=['amount'],
+                         name='ingredient_amount_recipe_idx'),
+        ]
 
     def __str__(self) -> str:
 
@@ -158,6 +265,14 @@ class ShoppingCart(models.Model):
         to=Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        # Заменён индексом shopping_cart_recipe_user_idx.
+        db_index=False,
+    )
+    added_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        # null - добавлен до появления поля.
+        null=True,
     )
 
     class Meta:
@@ -171,11 +286,45 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart'
             ),
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='shopping_cart_recipe_user_idx'),
+            # Окно недавних добавлений для recipes.trending.
+            models.Index(fields=['added_at'],
+                         name='shopping_cart_added_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user}: {self.recipe}'
 
 
+class ShoppingCartVersion(models.Model):
+    """
+    Время последнего изменения корзины пользователя - версия
+    списка покупок для ETag и кэша. Меняется в одной транзакции
+    с корзиной и рецептами в ней (api.signals), строка создаётся
+    при первом изменении. Пока её нет, версия - дата регистрации.
+    """
+    user = models.OneToOneField(
+        to=User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_version',
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        default=timezone.now,
+    )
+
+    class Meta:
+        verbose_name = 'Версия списка покупок'
+        verbose_name_plural = 'Версии списков покупок'
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.updated_at}'
+
+
 class Favorites(models.Model):
     """
     Модель для избранного.
@@ -189,6 +338,14 @@ class Favorites(models.Model):
         to=Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        # Заменён индексом favorites_recipe_user_idx.
+        db_index=False,
+    )
+    added_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        # null - добавлен до появления поля.
+        null=True,
     )
 
     class Meta:
@@ -202,6 +359,117 @@ class Favorites(models.Model):
                 name='unique_favorites'
             ),
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='favorites_recipe_user_idx'),
+            models.Index(fields=['added_at'],
+                         name='favorites_added_at_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user}: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт по составу ингредиентов.
+    Заполняется recipes.similarity: командой build_similar_recipes
+    и задачей similar_recipes после изменения рецепта.
+    """
+    recipe = models.ForeignKey(
+        to=Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar',
+        # Заменён индексом similar_recipe_score_idx.
+        db_index=False,
+    )
+    similar = models.ForeignKey(
+        to=Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        indexes = [
+            # Список похожих отдаётся одним чтением по индексу.
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} -> {self.similar_id}: {self.score:.2f}'
+
+
+class RecipeBand(models.Model):
+    """
+    Полоса MinHash сигнатуры рецепта (recipes.similarity).
+    Рецепты с общим key - кандидаты в похожие: по ним пересчёт
+    после изменения рецепта находит кандидатов так же, как полный
+    пересчёт. Заполняется вместе с SimilarRecipe.
+    """
+    recipe = models.ForeignKey(
+        to=Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='bands',
+    )
+    key = models.BigIntegerField(
+        verbose_name='Хэш полосы',
+    )
+
+    class Meta:
+        verbose_name = 'Полоса MinHash'
+        verbose_name_plural = 'Полосы MinHash'
+        indexes = [
+            # Рецепты с той же полосой читаются только из индекса.
+            models.Index(fields=['key', 'recipe'],
+                         name='recipe_band_key_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.key}'
+
+
+class TrendingRecipe(models.Model):
+    """
+    Популярный сейчас рецепт.
+    Таблицу целиком перезаписывает команда compute_trending
+    (recipes.trending), лента с ?ordering=trending читает её
+    по индексу в порядке убывания score.
+    """
+    recipe = models.OneToOneField(
+        to=Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+    )
+    score = models.FloatField(
+        verbose_name='Популярность',
+    )
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+        ordering = ('-score',)
+        indexes = [
+            models.Index(fields=['-score', 'recipe'],
+                         name='trending_recipe_score_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.score:.2f}'
@@ -0,0 +1,275 @@
+"""
+Похожие рецепты по составу ингредиентов.
+
+Сходство двух рецептов - коэффициент Жаккара наборов ингредиентов:
+доля общих ингредиентов среди всех ингредиентов обоих рецептов.
+Для каждого рецепта в SimilarRecipe хранятся SIMILAR_RECIPES_COUNT
+самых похожих.
+
+Пересчёт не сравнивает все пары рецептов: кандидаты находятся через
+MinHash и LSH. Сигнатура рецепта - минимумы NUM_PERM хэш-функций
+по его ингредиентам; два рецепта совпадают в одной позиции сигнатуры
+с вероятностью, равной их сходству. Сигнатура режется на BANDS
+полос по ROWS позиций, и рецепты с совпавшей полосой становятся
+кандидатами: пара со сходством s находится с вероятностью
+1 - (1 - s ** ROWS) ** BANDS - при BANDS=32, ROWS=2 это ~73% для 0.2,
+~95% для 0.3 и почти 100% от 0.5. Для кандидатов сходство считается
+точно.
+
+Ключи полос хранятся в RecipeBand. После изменения рецепта
+(refresh_similar) его кандидаты читаются из таблицы по ключам
+его полос, а не из всех рецептов с общими ингредиентами: полоса
+из соли и воды не тянет за собой весь каталог. В чужих списках
+у изменённого рецепта пересчитывается сходство, а в списки его
+соседей он добавляется. Рецепт, который стал менее похож, остаётся
+в чужом списке, пока сходство не ниже MIN_SCORE, - лучшая замена
+ему находится при следующем полном пересчёте.
+"""
+import hashlib
+import heapq
+import random
+from array import array
+from collections import defaultdict
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import IngredientAmountInRecipe, RecipeBand, SimilarRecipe
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Полосы, совпавшие у слишком многих рецептов (самые частые
+# ингредиенты), кандидатов не дают: сравнение внутри них стоит
+# квадрат размера и почти ничего не находит.
+MAX_BUCKET_SIZE = 1000
+MIN_SCORE = 0.1
+PRIME = (1 << 61) - 1
+BATCH_SIZE = 5000
+
+
+def load_ingredient_sets(recipe_ids: Iterable | None = None) -> dict:
+    """
+    Наборы id ингредиентов рецептов: {id рецепта: frozenset}.
+    recipe_ids - список id или QuerySet с ними, None - все рецепты.
+    """
+    rows = IngredientAmountInRecipe.objects.order_by()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    sets = defaultdict(set)
+    for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id').iterator(chunk_size=BATCH_SIZE):
+        sets[recipe_id].add(ingredient_id)
+    return {recipe_id: frozenset(items) for recipe_id, items in sets.items()}
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    common = len(first & second)
+    union = len(first) + len(second) - common
+    return common / union if union else 0.0
+
+
+def signatures(sets: dict, seed: int = 0) -> dict:
+    """
+    MinHash сигнатуры наборов.
+    Хэши считаются один раз на ингредиент, сигнатура рецепта -
+    поэлементный минимум хэшей его ингредиентов.
+    """
+    rng = random.Random(seed)
+    params = [(rng.randrange(1, PRIME), rng.randrange(PRIME))
+              for _ in range(NUM_PERM)]
+    hashes = {}
+    result = {}
+    for recipe_id, items in sets.items():
+        rows = []
+        for item in items:
+            if item not in hashes:
+                hashes[item] = tuple((a * item + b) % PRIME
+                                     for a, b in params)
+            rows.append(hashes[item])
+        result[recipe_id] = (tuple(map(min, *rows)) if len(rows) > 1
+                             else rows[0])
+    return result
+
+
+def band_keys(signature: tuple) -> array:
+    """
+    Ключи полос сигнатуры - 64-битные хэши номера и значений полосы,
+    одинаковые в памяти (lsh_buckets) и в RecipeBand.
+    """
+    keys = array('q')
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            repr((band, signature[band * ROWS:(band + 1) * ROWS])).encode(),
+            digest_size=8,
+        ).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def lsh_buckets(recipe_keys: dict) -> dict:
+    """
+    Полосы, совпавшие у нескольких рецептов: {id рецепта: [кортежи
+    рецептов с общей полосой]}. Кортеж полосы общий для всех её
+    рецептов, кандидаты собираются по одному рецепту в top_similar:
+    множества кандидатов для всех рецептов сразу не помещаются
+    в память на сотне тысяч рецептов.
+    """
+    buckets = defaultdict(list)
+    for recipe_id, keys in recipe_keys.items():
+        for key in keys:
+            buckets[key].append(recipe_id)
+    memberships = defaultdict(list)
+    for members in buckets.values():
+        if 1 < len(members) <= MAX_BUCKET_SIZE:
+            members = tuple(members)
+            for recipe_id in members:
+                memberships[recipe_id].append(members)
+    return memberships
+
+
+def band_candidates(keys: Iterable[int]) -> set:
+    """
+    Рецепты с общими полосами из RecipeBand. Полосы больше
+    MAX_BUCKET_SIZE пропускаются, как в полном пересчёте.
+    Оба запроса читают только индекс recipe_band_key_idx.
+    """
+    sizes = RecipeBand.objects.filter(key__in=list(keys)).values(
+        'key'
+    ).annotate(size=Count('recipe')).order_by()
+    keys = [row['key'] for row in sizes if row['size'] <= MAX_BUCKET_SIZE]
+    return set(RecipeBand.objects.filter(key__in=keys).values_list(
+        'recipe_id', flat=True
+    ))
+
+
+def band_rows(recipe_keys: dict) -> Iterable[RecipeBand]:
+    return (RecipeBand(recipe_id=recipe_id, key=key)
+            for recipe_id, keys in recipe_keys.items() for key in keys)
+
+
+def top_similar(recipe_id: int, items: frozenset, candidates: Iterable[int],
+                sets: dict, count: int) -> list:
+    """count самых похожих кандидатов: [(сходство, id рецепта)]."""
+    scored = (
+        (jaccard(items, sets[other]), other)
+        for other in candidates if other != recipe_id and other in sets
+    )
+    return heapq.nlargest(
+        count, (pair for pair in scored if pair[0] >= MIN_SCORE)
+    )
+
+
+def rebuild_similar(count: int | None = None) -> int:
+    """
+    Полный пересчёт SimilarRecipe и RecipeBand через MinHash/LSH.
+    Списки заменяются пачками, читатели не видят пустую таблицу.
+    Возвращает число записанных пар.
+    """
+    count = count or settings.SIMILAR_RECIPES_COUNT
+    sets = load_ingredient_sets()
+    recipe_keys = {recipe_id: band_keys(signature)
+                   for recipe_id, signature in signatures(sets).items()}
+    buckets = lsh_buckets(recipe_keys)
+    recipe_ids = sorted(sets)
+    total = 0
+    # Пачка заменяет списки и полосы рецептов с id из (low, последний
+    # в пачке], заодно удаляются данные рецептов без ингредиентов.
+    low = 0
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        rows = []
+        for recipe_id in batch:
+            rows.extend(
+                SimilarRecipe(recipe_id=recipe_id, similar_id=other,
+                              score=score)
+                for score, other in top_similar(
+                    recipe_id, sets[recipe_id],
+                    set().union(*buckets.get(recipe_id, ())), sets, count
+                )
+            )
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__gt=low, recipe_id__lte=batch[-1]
+            ).delete()
+            SimilarRecipe.objects.bulk_create(rows, batch_size=BATCH_SIZE,
+                                              ignore_conflicts=True)
+            RecipeBand.objects.filter(
+                recipe_id__gt=low, recipe_id__lte=batch[-1]
+            ).delete()
+            RecipeBand.objects.bulk_create(
+                band_rows({recipe_id: recipe_keys[recipe_id]
+                           for recipe_id in batch}),
+                batch_size=BATCH_SIZE,
+            )
+        low = batch[-1]
+        total += len(rows)
+    SimilarRecipe.objects.filter(recipe_id__gt=low).delete()
+    RecipeBand.objects.filter(recipe_id__gt=low).delete()
+    return total
+
+
+@transaction.atomic
+def refresh_similar(recipe_ids: Iterable[int],
+                    count: int | None = None) -> int:
+    """
+    Пересчёт соседей изменённых рецептов по кандидатам из RecipeBand.
+    Изменённый рецепт попадает в списки своих соседей, если похож
+    на них сильнее их последнего соседа. В остальных списках у него
+    обновляется сходство, ниже MIN_SCORE - рецепт из списка удаляется.
+    Возвращает число записанных пар.
+    """
+    count = count or settings.SIMILAR_RECIPES_COUNT
+    recipe_ids = list(recipe_ids)
+    changed = load_ingredient_sets(recipe_ids)
+    recipe_keys = {recipe_id: band_keys(signature)
+                   for recipe_id, signature in signatures(changed).items()}
+    RecipeBand.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeBand.objects.bulk_create(band_rows(recipe_keys),
+                                   batch_size=BATCH_SIZE)
+    candidates = band_candidates(
+        {key for keys in recipe_keys.values() for key in keys}
+    )
+    listed_in = list(
+        SimilarRecipe.objects.filter(similar_id__in=recipe_ids)
+        .exclude(recipe_id__in=recipe_ids)
+    )
+    sets = load_ingredient_sets(
+        (candidates | {row.recipe_id for row in listed_in}) - set(changed)
+    )
+    sets.update(changed)
+
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    kept, dropped = [], []
+    for row in listed_in:
+        row.score = jaccard(sets.get(row.recipe_id, frozenset()),
+                            changed.get(row.similar_id, frozenset()))
+        (kept if row.score >= MIN_SCORE else dropped).append(row)
+    SimilarRecipe.objects.bulk_update(kept, ['score'],
+                                      batch_size=BATCH_SIZE)
+    SimilarRecipe.objects.filter(id__in=[row.id for row in dropped]).delete()
+
+    listed = {(row.recipe_id, row.similar_id) for row in listed_in}
+    rows = []
+    extended = set()
+    for recipe_id, items in changed.items():
+        for score, other in top_similar(recipe_id, items, candidates, sets,
+                                        count):
+            rows.append(SimilarRecipe(recipe_id=recipe_id, similar_id=other,
+                                      score=score))
+            if other not in changed and (other, recipe_id) not in listed:
+                rows.append(SimilarRecipe(recipe_id=other,
+                                          similar_id=recipe_id, score=score))
+                extended.add(other)
+    # Пару мог уже добавить параллельный пересчёт соседнего рецепта.
+    SimilarRecipe.objects.bulk_create(rows, batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+    # Списки соседей, в которые добавился рецепт, обрезаются до count.
+    for recipe_id in extended:
+        extra = SimilarRecipe.objects.filter(recipe_id=recipe_id).order_by(
+            '-score', 'id'
+        ).values_list('id', flat=True)[count:]
+        SimilarRecipe.objects.filter(id__in=list(extra)).delete()
+    return len(rows)
@@ -0,0 +1,132 @@
+"""
+Популярные сейчас рецепты.
+
+Популярность рецепта - сумма добавлений в избранное и в списки
+покупок с весом, который убывает вдвое каждые
+TRENDING_HALF_LIFE_HOURS часов от начала часа добавления. Добавления
+старше TRENDING_WINDOW_HOURS не учитываются.
+
+На PostgreSQL и SQLite с математическими функциями таблица
+заполняется одним INSERT ... SELECT: сумма, вес, сортировка и отбор
+count рецептов выполняются в базе. Без EXP в базе добавления
+считаются запросом на таблицу, сгруппированными по рецепту и часу,
+а вес и отбор - в Python.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, QuerySet
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from recipes.models import Favorites, ShoppingCart, TrendingRecipe
+
+# Список покупок - более сильный сигнал, чем избранное:
+# по рецепту собираются готовить.
+WEIGHTS = (
+    (Favorites, 1.0),
+    (ShoppingCart, 2.0),
+)
+
+# Возраст добавления в часах от начала его часа, не меньше нуля;
+# %s - текущее время.
+AGE_HOURS_SQL = {
+    'postgresql': "GREATEST(EXTRACT(EPOCH FROM %s - date_trunc('hour', "
+                  "added_at)) / 3600, 0)",
+    'sqlite': "MAX((julianday(%s) - julianday(strftime("
+              "'%%Y-%%m-%%d %%H:00:00', added_at))) * 24, 0)",
+}
+
+
+def hourly_counts(queryset: QuerySet, since: datetime) -> QuerySet:
+    """Число добавлений по рецептам и часам начиная с since."""
+    return (
+        queryset.filter(added_at__gte=since)
+        .annotate(hour=TruncHour('added_at'))
+        .values('recipe_id', 'hour')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+
+def trending_scores(now: datetime | None = None) -> dict:
+    """Популярность рецептов: {id рецепта: score}."""
+    now = now or timezone.now()
+    since = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    decay = math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+    scores = {}
+    for model, weight in WEIGHTS:
+        for row in hourly_counts(model.objects.all(), since).iterator():
+            age = max((now - row['hour']).total_seconds() / 3600, 0)
+            scores[row['recipe_id']] = (
+                scores.get(row['recipe_id'], 0)
+                + weight * row['count'] * math.exp(-decay * age)
+            )
+    return scores
+
+
+def has_exp() -> bool:
+    """Есть ли в базе функция EXP: в SQLite - только со сборкой math."""
+    if connection.vendor not in AGE_HOURS_SQL:
+        return False
+    if connection.vendor == 'postgresql':
+        return True
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT EXP(0)')
+    except DatabaseError:
+        return False
+    return True
+
+
+def insert_trending(count: int, now: datetime) -> int:
+    """
+    INSERT ... SELECT count самых популярных рецептов в пустую
+    TrendingRecipe. Возвращает число записанных рецептов.
+    """
+    quote = connection.ops.quote_name
+    since = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    decay = math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+    age = AGE_HOURS_SQL[connection.vendor]
+    additions, params = [], []
+    for model, weight in WEIGHTS:
+        additions.append(
+            f'SELECT recipe_id, {age} AS age, %s AS weight '
+            f'FROM {quote(model._meta.db_table)} WHERE added_at >= %s'
+        )
+        params.extend((now, weight, since))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(TrendingRecipe._meta.db_table)} '
+            f'(recipe_id, score) '
+            f'SELECT recipe_id, SUM(weight * EXP(%s * age)) AS score '
+            f'FROM ({" UNION ALL ".join(additions)}) AS additions '
+            f'GROUP BY recipe_id ORDER BY score DESC, recipe_id LIMIT %s',
+            [-decay, *params, count],
+        )
+        return cursor.rowcount
+
+
+def compute_trending(count: int | None = None,
+                     now: datetime | None = None) -> int:
+    """
+    Перезаписывает TrendingRecipe count самыми популярными
+    рецептами. Замена идёт в одной транзакции, лента не видит
+    пустую таблицу. Возвращает число записанных рецептов.
+    """
+    count = count or settings.TRENDING_RECIPES_COUNT
+    now = now or timezone.now()
+    if has_exp():
+        with transaction.atomic():
+            TrendingRecipe.objects.all().delete()
+            return insert_trending(count, now)
+    scores = trending_scores(now)
+    top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    rows = [TrendingRecipe(recipe_id=recipe_id, score=score)
+            for recipe_id, score in top[:count]]
+    with transaction.atomic():
+        TrendingRecipe.objects.all().delete()
+        TrendingRecipe.objects.bulk_create(rows)
+    return len(rows)
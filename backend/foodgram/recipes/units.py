@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+# Единица измерения -> (каноническая единица, множитель).
+# Суммирование в списке покупок идёт в канонических единицах,
+# единицы, которых нет в таблице, остаются как есть с множителем 1.
+# Массу и объём не смешиваем: без плотности продукта граммы
+# в миллилитры не переводятся.
+UNIT_CONVERSIONS = {
+    'г': ('г', Decimal(1)),
+    'кг': ('г', Decimal(1000)),
+    'мл': ('мл', Decimal(1)),
+    'л': ('мл', Decimal(1000)),
+    'ч. л.': ('мл', Decimal(5)),
+    'ст. л.': ('мл', Decimal(15)),
+    'стакан': ('мл', Decimal(250)),
+    'капля': ('мл', Decimal('0.05')),
+    'шт.': ('шт.', Decimal(1)),
+    'пакет': ('пакетик', Decimal(1)),
+    'пакетик': ('пакетик', Decimal(1)),
+    'пачка': ('упаковка', Decimal(1)),
+    'упаковка': ('упаковка', Decimal(1)),
+}
+
+# Каноническая единица -> крупные единицы для вывода, по убыванию.
+DISPLAY_UNITS = {
+    'г': ((Decimal(1000), 'кг'),),
+    'мл': ((Decimal(1000), 'л'),),
+}
+
+
+def to_canonical(unit: str) -> tuple[str, Decimal]:
+    """Каноническая единица и множитель перевода в неё."""
+    return UNIT_CONVERSIONS.get(unit, (unit, Decimal(1)))
+
+
+def format_amount(amount: Decimal, unit: str) -> str:
+    """
+    Количество в канонических единицах для списка покупок:
+    1500 г -> 1,5 кг, 30 мл -> 30 мл.
+    """
+    for factor, display_unit in DISPLAY_UNITS.get(unit, ()):
+        if amount >= factor:
+            amount, unit = amount / factor, display_unit
+            break
+    amount = round(Decimal(amount), 2).normalize()
+    text = f'{amount:f}'.replace('.', ',')
+    return f'{text} {unit}'
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-19 07:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptions',
+            index=models.Index(fields=['author', 'user'], name='subscriptions_author_user_idx'),
+        ),
+        migrations.AlterField(
+            model_name='subscriptions',
+            name='author',
+            field=models.ForeignKey(db_index=False, help_text='Пользователь, на которого подписываются', on_delete=django.db.models.deletion.CASCADE, related_name='signed', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+    ]
@@ -55,6 +55,8 @@ class Subscriptions(models.Model):
         help_text='Пользователь, на которого подписываются',
         on_delete=models.CASCADE,
         related_name='signed',
+        # Заменён индексом subscriptions_author_user_idx.
+        db_index=False,
     )
 
     class Meta:
@@ -70,6 +72,10 @@ class Subscriptions(models.Model):
                 name='check_self_subscription'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscriptions_author_user_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user} подписан на {self.author}'